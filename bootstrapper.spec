@@ -1,11 +1,14 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
+# Wheelhouse opcional para pip offline (ver README).
+wheel_datas = [('installer\\wheels', 'wheels')] if os.path.isdir('installer\\wheels') else []
 
 a = Analysis(
     ['installer\\bootstrapper.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=wheel_datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -22,12 +22,18 @@ import json
 import re
 import math
 import uuid
+import functools
+import heapq
 import threading
 import queue
+import random
 import platform
+import itertools
 import importlib.util
+from collections import Counter
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 from typing import Dict, List, Any, Tuple, Optional, Iterable
 
 import requests
@@ -95,6 +101,48 @@ if psutil_spec:
 else:
     psutil = None  # type: ignore
 
+watchdog_spec = importlib.util.find_spec("watchdog")
+if watchdog_spec:
+    from watchdog.observers import Observer  # type: ignore
+    from watchdog.events import FileSystemEventHandler  # type: ignore
+    try:
+        # Solo el backend inotify (Linux) emite `closed`; ReadDirectoryChangesW (Windows) no.
+        from watchdog.observers.inotify import InotifyObserver  # type: ignore
+    except Exception:
+        InotifyObserver = None  # type: ignore
+else:
+    Observer = None  # type: ignore
+    InotifyObserver = None  # type: ignore
+    FileSystemEventHandler = object  # type: ignore
+
+# JSON codec: orjson > ujson > json. Siempre UTF-8 sin escapar no-ASCII (igual que ensure_ascii=False).
+if importlib.util.find_spec("orjson"):
+    import orjson  # type: ignore
+
+    def _json_dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+
+    _json_loads = orjson.loads
+elif importlib.util.find_spec("ujson"):
+    import ujson  # type: ignore
+
+    def _json_dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, indent=2 if indent else 0).encode("utf-8")
+
+    _json_loads = ujson.loads
+else:
+    def _json_dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+    _json_loads = json.loads
+
+msgpack_spec = importlib.util.find_spec("msgpack")
+if msgpack_spec:
+    import msgpack  # type: ignore
+else:
+    msgpack = None  # type: ignore
+
 try:
     from zoneinfo import ZoneInfo  # py3.9+
 except Exception:
@@ -109,13 +157,73 @@ DEFAULT_WEB_API_KEY = "4df6e5051f959afa012c2498592765c7417e09b05b1f0edf451d34fb6
 DEFAULT_HTTP_TIMEOUT = 120
 DEFAULT_BATCH_SIZE = 80  # más seguro contra 413 que 100
 DEFAULT_STATS_BATCH_SIZE = 80
+# Códigos HTTP del uploader web que no se reintentan.
+HTTP_AUTH_FAIL = frozenset({401, 403})
+HTTP_VALIDATION_FAIL = frozenset({400, 422})
+DUAL_KEY_BATCHES = 2  # lotes por sesión con llaves snake+camel aunque el server ya declaró estilo
 DEFAULT_TZ = "America/New_York"
 
 STATE_FILENAME = os.getenv("BRIDGE_STATE_FILE", "gat_bridge_state.json")
+STATE_MSGPACK_FILENAME = os.path.splitext(STATE_FILENAME)[0] + ".msgpack"
 LOCAL_QUEUE_FILE = os.getenv("UPLOAD_QUEUE_FILE", "upload_queue.jsonl")
 UPLOADER_VERSION = "44.0"
 
 
+# =========================
+# Normalización de nombres (cacheada: entradas repetidas ~tamaño del roster)
+# =========================
+@functools.lru_cache(maxsize=4096)
+def _cached_canonical_key(name: str, default_realm: str) -> str:
+    n = (name or "").strip()
+    if not n:
+        return n
+    if "-" in n:
+        return n
+    if not default_realm:
+        return n
+    return f"{n}-{default_realm}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_short_name(full: str) -> str:
+    return (full or "").split("-", 1)[0]
+
+
+def _int_or_none(k: Any) -> Optional[int]:
+    try:
+        return int(k)
+    except Exception:
+        return None
+
+
+def _snapshot_ts(s: Dict[str, Any]) -> int:
+    try:
+        return int(s.get("ts", 0) or 0)
+    except Exception:
+        return 0
+
+
+def _roster_rank_name(info: Dict[str, Any]) -> Any:
+    """rankName que viaja en `data`: el del chat, o el rank del roster si falta."""
+    rank_name = info.get("rankName")
+    if not rank_name or rank_name == "—":
+        rank_name = info.get("rank")
+    return rank_name
+
+
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# `online` vacío compartido para los snapshots no finales de cada lote de stats (solo lectura).
+_EMPTY_ONLINE: Dict[str, Any] = {}
+
+
+@functools.lru_cache(maxsize=8192)
+def _utc_iso(ts: int) -> str:
+    """Epoch (s) -> "YYYY-MM-DDTHH:MM:SSZ" sin fromtimestamp/strftime; los ts se repiten entre ciclos."""
+    dt = _EPOCH_UTC + timedelta(seconds=ts)
+    return "%04d-%02d-%02dT%02d:%02d:%02dZ" % (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+
+
 class ConsoleReporter:
     """
     Reporter ultra simple para modo headless: todo se loguea a consola con mucho detalle.
@@ -159,6 +267,39 @@ class ConsoleReporter:
 
 # Null UI placeholder (headless mode)
 _NullUI = ConsoleReporter  # alias for headless mode / no-UI fallback
+
+
+class _SavedVariablesHandler(FileSystemEventHandler):
+    """
+    Despierta el loop principal cuando WoW escribe el SavedVariables vigilado.
+    `closed` solo llega en backends que lo soportan (inotify IN_CLOSE_WRITE).
+    `opened`/`closed_no_write` son lecturas (incluidas las del propio bridge): no son cambios.
+    """
+
+    _IGNORED_EVENTS = frozenset({"opened", "closed_no_write"})
+
+    def __init__(self, target_path: str, changed: threading.Event, closed: threading.Event):
+        super().__init__()
+        self._target = os.path.normcase(os.path.abspath(target_path))
+        self._changed = changed
+        self._closed = closed
+
+    def _matches(self, path: Any) -> bool:
+        if not path:
+            return False
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        return os.path.normcase(os.path.abspath(path)) == self._target
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type in self._IGNORED_EVENTS:
+            return
+        if not (self._matches(event.src_path) or self._matches(getattr(event, "dest_path", ""))):
+            return
+        if event.event_type == "closed":
+            self._closed.set()
+        self._changed.set()
+
 @dataclass
 class BridgeState:
     last_uploaded_stats_ts: int = 0
@@ -198,25 +339,26 @@ class LocalUploadQueue:
                 "purpose": purpose,
                 "payload": payload,
             }
-            with open(self.path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            with open(self.path, "ab") as f:
+                f.write(_json_dumps_bytes(record) + b"\n")
         except Exception as e:
             logger.warning(f"No pude guardar en cola local: {e}")
 
     def load_entries(self) -> List[Dict[str, Any]]:
         entries: List[Dict[str, Any]] = []
-        if not os.path.isfile(self.path):
-            return entries
         try:
+            # Sin isfile() previo: un solo open, y la ausencia del archivo es el caso "cola vacía".
             with open(self.path, "r", encoding="utf-8") as f:
                 for line in f:
                     line = line.strip()
                     if not line:
                         continue
                     try:
-                        entries.append(json.loads(line))
+                        entries.append(_json_loads(line))
                     except Exception:
                         continue
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.warning(f"No pude leer cola local: {e}")
         return entries
@@ -225,9 +367,9 @@ class LocalUploadQueue:
         try:
             self._ensure_dir()
             tmp = self.path + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
+            with open(tmp, "wb") as f:
                 for e in entries:
-                    f.write(json.dumps(e, ensure_ascii=False) + "\n")
+                    f.write(_json_dumps_bytes(e) + b"\n")
             os.replace(tmp, self.path)
         except Exception as e:
             logger.warning(f"No pude reescribir cola local: {e}")
@@ -266,7 +408,26 @@ class LocalUploadQueue:
 class Config:
     """
     Mantiene los mismos campos del V43, pero agrega robustez en WEB_API_URL.
+    Usa __slots__: los campos se leen en cada ciclo y no hace falta __dict__.
     """
+    __slots__ = (
+        "wow_addon_path",
+        "default_realm",
+        "poll_interval",
+        "wow_process_names",
+        "web_api_url",
+        "web_api_key",
+        "http_timeout",
+        "batch_size",
+        "stats_batch_size",
+        "enable_web_upload",
+        "enable_stats_incremental_web",
+        "min_roster_size",
+        "web_url",
+        "roster_batch_size",
+        "roster_mode",
+    )
+
     def __init__(self):
         load_dotenv()
 
@@ -476,6 +637,7 @@ class GuildActivityBridge:
             "last_parse_ok": None,
             "last_latency_ms": None,
             "last_payload_size": None,
+            "server_style": None,
             "version": UPLOADER_VERSION,
         }
         self._ui_activity = "En espera"
@@ -493,11 +655,19 @@ class GuildActivityBridge:
         self.local_queue = LocalUploadQueue(os.path.join(os.path.dirname(os.path.abspath(__file__)), LOCAL_QUEUE_FILE))
 
         self.state_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), STATE_FILENAME)
+        self.state_msgpack_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), STATE_MSGPACK_FILENAME)
         self.state = self._load_state()
         self._stop_event = threading.Event()
         self._force_full_roster = threading.Event()
         self._force_reason = "manual"
 
+        # Watcher de SavedVariables (watchdog); si no está disponible se usa polling de mtime.
+        self._observer = None
+        self._watcher_disabled = Observer is None
+        self._watcher_emits_close = False
+        self._file_changed = threading.Event()
+        self._file_closed = threading.Event()
+
         console_state_init = getattr(self, "_init_console_window_state", None)
         self._console_toggle_available = console_state_init() if callable(console_state_init) else False
         minimize_console = getattr(self, "_minimize_console_window", None)
@@ -511,27 +681,56 @@ class GuildActivityBridge:
     # =========================
     # Estado persistente local
     # =========================
+    def _state_file_to_load(self) -> Optional[str]:
+        """
+        Con msgpack disponible se prefiere el binario, salvo que el JSON sea más reciente
+        (p. ej. se corrió una versión sin msgpack después).
+        """
+        candidates = [self.state_path]
+        if msgpack is not None:
+            candidates.append(self.state_msgpack_path)
+        # Un solo stat por candidato (antes isfile + getmtime).
+        best: Optional[str] = None
+        best_mtime = -1.0
+        for p in candidates:
+            try:
+                mtime = os.stat(p).st_mtime
+            except OSError:
+                continue
+            if mtime > best_mtime:
+                best, best_mtime = p, mtime
+        return best
+
     def _load_state(self) -> BridgeState:
+        path = self._state_file_to_load()
         try:
-            if os.path.isfile(self.state_path):
-                with open(self.state_path, "r", encoding="utf-8") as f:
-                    d = json.load(f)
+            if path:
+                with open(path, "rb") as f:
+                    raw = f.read()
+                if path == self.state_msgpack_path:
+                    d = msgpack.unpackb(raw, raw=False, strict_map_key=False)
+                else:
+                    d = _json_loads(raw)
                 return BridgeState.from_dict(d if isinstance(d, dict) else {})
         except Exception as e:
-            logger.warning(f"{Fore.YELLOW}No pude cargar state file ({self.state_path}): {e}")
+            logger.warning(f"{Fore.YELLOW}No pude cargar state file ({path}): {e}")
         return BridgeState()
 
     def _save_state(self):
+        path = self.state_msgpack_path if msgpack is not None else self.state_path
         try:
-            tmp = self.state_path + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(self.state.to_dict(), f, ensure_ascii=False, indent=2)
-            os.replace(tmp, self.state_path)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                if msgpack is not None:
+                    f.write(msgpack.packb(self.state.to_dict(), use_bin_type=True))
+                else:
+                    f.write(_json_dumps_bytes(self.state.to_dict(), indent=True))
+            os.replace(tmp, path)
         except Exception as e:
-            logger.warning(f"{Fore.YELLOW}No pude guardar state file ({self.state_path}): {e}")
+            logger.warning(f"{Fore.YELLOW}No pude guardar state file ({path}): {e}")
 
-    def _make_upload_session_id(self) -> str:
-        return f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    def _make_upload_session_id(self, now: Optional[datetime] = None) -> str:
+        return f"{(now or datetime.now()).strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
 
     def _is_wow_running(self) -> bool:
         if psutil is None:
@@ -551,6 +750,14 @@ class GuildActivityBridge:
 
     def stop(self):
         self._stop_event.set()
+        self._file_changed.set()
+        observer = self._observer
+        self._observer = None
+        if observer is not None:
+            try:
+                observer.stop()
+            except Exception:
+                pass
 
     # =========================
     # Loop principal
@@ -562,6 +769,7 @@ class GuildActivityBridge:
         logger.info(f"Roster mode: {self.config.roster_mode} | batch_size={self.config.roster_batch_size} | stats_batch_size={self.config.stats_batch_size}")
         self._check_latest_version()
         self._start_command_listener()
+        self._ensure_file_watcher()
 
         if self._autostart_supported:
             status = "habilitado" if self._autostart_enabled else "deshabilitado"
@@ -591,6 +799,41 @@ class GuildActivityBridge:
 
         threading.Thread(target=_listen, daemon=True).start()
 
+    def _ensure_file_watcher(self) -> bool:
+        """Arranca el observer de watchdog sobre la carpeta del SavedVariables (una sola vez)."""
+        if self._observer is not None:
+            return True
+        if self._watcher_disabled:
+            return False
+
+        watch_dir = os.path.dirname(self.config.wow_addon_path)
+        if not watch_dir or not os.path.isdir(watch_dir):
+            # La carpeta aún no existe (WoW sin /reload): reintentamos en el loop.
+            return False
+
+        try:
+            handler = _SavedVariablesHandler(self.config.wow_addon_path, self._file_changed, self._file_closed)
+            observer = Observer()
+            observer.schedule(handler, watch_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            self._watcher_disabled = True
+            logger.warning(f"{Fore.YELLOW}No pude iniciar watcher de archivos ({e}). Usando polling.")
+            return False
+
+        self._observer = observer
+        self._watcher_emits_close = InotifyObserver is not None and isinstance(observer, InotifyObserver)
+        logger.info(f"Watcher de archivos activo en: {watch_dir}")
+        return True
+
+    def _sleep_until_change(self, timeout: float):
+        """Duerme hasta `timeout` segundos, o menos si el watcher reporta un cambio."""
+        if self._observer is None:
+            time.sleep(timeout)
+            return
+        self._file_changed.wait(timeout)
+
     def _run_loop(self):
         last_wow_state: Optional[bool] = None
 
@@ -613,6 +856,11 @@ class GuildActivityBridge:
                     time.sleep(self.config.poll_interval)
                     continue
 
+                self._ensure_file_watcher()
+                # Un `closed` de una escritura anterior no debe confirmar la próxima.
+                self._file_closed.clear()
+                self._file_changed.clear()
+
                 if os.path.isfile(self.config.wow_addon_path):
                     current_mtime = os.path.getmtime(self.config.wow_addon_path)
                     needs_process = False
@@ -630,7 +878,7 @@ class GuildActivityBridge:
                         self.process_file()
 
                 self._refresh_ui(True)
-                time.sleep(self.config.poll_interval)
+                self._sleep_until_change(self.config.poll_interval)
 
             except KeyboardInterrupt:
                 logger.info("Cerrando bridge por KeyboardInterrupt.")
@@ -640,7 +888,12 @@ class GuildActivityBridge:
                 logger.error(f"Error ciclo: {e}", exc_info=True)
                 time.sleep(5)
 
-    def _wait_for_file_stable(self, path: str, checks: int = 4, delay: float = 0.7):
+    def _wait_for_file_stable(self, path: str, checks: int = 4, delay: float = 0.7, quiet: float = 0.3):
+        # Solo con inotify un `closed` (IN_CLOSE_WRITE) confirma el fin de la escritura; los backends
+        # sin ese evento (ReadDirectoryChangesW en Windows) van directo a la estabilidad por stat.
+        if self._observer is not None and self._watcher_emits_close and self._wait_for_write_close(checks * 3 * delay, quiet):
+            return
+
         last = (-1, -1.0)
         stable = 0
         for _ in range(checks * 3):
@@ -658,6 +911,26 @@ class GuildActivityBridge:
                 pass
             time.sleep(delay)
 
+    def _wait_for_write_close(self, max_wait: float, quiet: float) -> bool:
+        """
+        Con watcher activo: retorna al recibir `closed` (IN_CLOSE_WRITE) o cuando
+        pasan `quiet` segundos sin eventos nuevos sobre el archivo.
+        True solo si llegó `closed`.
+        """
+        closed = False
+        deadline = time.time() + max_wait
+        while time.time() < deadline:
+            if self._file_closed.is_set():
+                closed = True
+                break
+            self._file_changed.clear()
+            if not self._file_changed.wait(quiet):
+                closed = self._file_closed.is_set()
+                break
+        self._file_closed.clear()
+        self._file_changed.clear()
+        return closed
+
     def _check_latest_version(self):
         try:
             base = self.config.web_api_url.rsplit("/api", 1)[0]
@@ -906,12 +1179,9 @@ class GuildActivityBridge:
         try:
             logger.info(f"{Fore.BLUE}Leyendo datos...")
             self._set_ui_activity("Leyendo SavedVariables", progress="Esperando datos")
-            with open(self.config.wow_addon_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-            if not content.strip():
+            table_text = self._read_lua_table(self.config.wow_addon_path)
+            if table_text == "":
                 return
-
-            table_text = self._extract_lua_table(content)
             if not table_text:
                 logger.error("No se pudo extraer la tabla LUA del archivo.")
                 return
@@ -926,7 +1196,8 @@ class GuildActivityBridge:
                 logger.error("El contenido LUA no decodificó a un diccionario.")
                 return
 
-            self.health["last_parse_ok"] = datetime.now().isoformat()
+            cycle_now = datetime.now()
+            self.health["last_parse_ok"] = cycle_now.isoformat()
             self._set_ui_activity("Datos decodificados", progress="Unificando tablas")
 
             processed_data, _active_count = self._process_and_merge_data(data)
@@ -938,7 +1209,7 @@ class GuildActivityBridge:
                 self._set_ui_activity("Preparando subida web", progress="Creando sesión")
                 self.local_queue.flush(self._post_to_web_with_retry)
 
-                web_session_id = self._make_upload_session_id()
+                web_session_id = self._make_upload_session_id(cycle_now)
                 self.state.last_web_session_id = web_session_id
                 self._save_state()
 
@@ -956,15 +1227,35 @@ class GuildActivityBridge:
     # =========================
     # LUA parsing helpers
     # =========================
-    def _extract_lua_table(self, content: str) -> Optional[str]:
-        idx = content.find("{")
-        if idx == -1:
-            return None
-        table = content[idx:].strip()
-        last = table.rfind("}")
+    def _read_lua_table(self, path: str, block_size: int = 1 << 20) -> Optional[str]:
+        """
+        Lee el SavedVariables por bloques de 1 MB y conserva solo desde el primer
+        '{' hasta el último '}', sin materializar el archivo completo + sus copias.
+        Devuelve "" si el archivo está vacío y None si no contiene tabla.
+        """
+        buf = bytearray()
+        has_content = False
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                if not buf:
+                    idx = block.find(b"{")
+                    if idx == -1:
+                        has_content = has_content or bool(block.strip())
+                        continue
+                    has_content = True
+                    block = block[idx:]
+                buf += block
+
+        if not buf:
+            return None if has_content else ""
+
+        last = buf.rfind(b"}")
         if last != -1:
-            table = table[: last + 1]
-        return table
+            del buf[last + 1:]
+        return buf.decode("utf-8", errors="replace")
 
     # =========================
     # Normalización de nombres
@@ -973,37 +1264,28 @@ class GuildActivityBridge:
         if self.config.default_realm:
             return self.config.default_realm
 
-        realm_counts: Dict[str, int] = {}
+        realm_counts: Counter = Counter()
 
-        def bump(full: str):
-            if "-" in full:
-                realm = full.split("-", 1)[1].replace(" ", "")
+        for k in itertools.chain(raw_activity, raw_roster):
+            full = str(k)
+            i = full.find("-")
+            if i != -1:
+                realm = full[i + 1:].replace(" ", "")
                 if realm:
-                    realm_counts[realm] = realm_counts.get(realm, 0) + 1
-
-        for k in raw_activity.keys():
-            bump(str(k))
-        for k in raw_roster.keys():
-            bump(str(k))
+                    realm_counts[realm] += 1
 
         if realm_counts:
-            best = sorted(realm_counts.items(), key=lambda x: (-x[1], x[0]))[0][0]
+            # Más frecuente; en empate gana el primero alfabéticamente (igual que antes).
+            best = min(realm_counts.items(), key=lambda x: (-x[1], x[0]))[0]
             return best
 
         return "Unknown"
 
     def _canonicalize_player_key(self, name: str, default_realm: str) -> str:
-        n = (name or "").strip()
-        if not n:
-            return n
-        if "-" in n:
-            return n
-        if not default_realm:
-            return n
-        return f"{n}-{default_realm}"
+        return _cached_canonical_key(name, default_realm)
 
     def _short_name(self, full: str) -> str:
-        return (full or "").split("-", 1)[0]
+        return _cached_short_name(full)
 
     def _build_roster_snapshot(self, roster_members: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         snapshot: Dict[str, Dict[str, Any]] = {}
@@ -1016,6 +1298,9 @@ class GuildActivityBridge:
                 "class": info.get("class", "UNKNOWN"),
                 "lastSeenTS": int(info.get("lastSeenTS", 0) or 0),
                 "lastMessage": info.get("lastMessage", ""),
+                # Lo que viaja en `data` (build_payload compara contra esto para omitir entradas sin cambios).
+                "rankName": _roster_rank_name(info) or "Member",
+                "total": int(info.get("total", 0) or 0),
             }
         return snapshot
 
@@ -1023,28 +1308,41 @@ class GuildActivityBridge:
         prev = self.state.roster_snapshot or {}
         current_snapshot = self._build_roster_snapshot(roster_members)
 
+        # Altas/bajas con operaciones de set sobre las llaves; solo las comunes se comparan por contenido.
+        added_names = current_snapshot.keys() - prev.keys()
+        removed: List[str] = sorted(prev.keys() - current_snapshot.keys())
+
         added: Dict[str, Dict[str, Any]] = {}
         updated: Dict[str, Dict[str, Any]] = {}
-        removed: List[str] = []
 
         for name, info in current_snapshot.items():
-            if name not in prev:
+            if name in added_names:
                 added[name] = roster_members.get(name, info)
-            elif info != prev.get(name, {}):
+            elif info != prev[name]:
                 updated[name] = roster_members.get(name, info)
 
-        for name in prev.keys():
-            if name not in current_snapshot:
-                removed.append(name)
-
         return added, updated, removed
 
+    def _build_activity_index(self, raw_activity: Dict[str, Any]) -> Dict[str, List[Tuple[str, Any]]]:
+        """
+        Agrupa las llaves "Nombre-Reino" de raw_activity por "Nombre" en una sola pasada,
+        para no recorrer todo el chat por cada miembro del roster.
+        """
+        index: Dict[str, List[Tuple[str, Any]]] = {}
+        for k, v in raw_activity.items():
+            ks = str(k)
+            i = ks.find("-")
+            if i != -1:
+                index.setdefault(ks[:i], []).append((ks, v))
+        return index
+
     def _find_chat_entry_for_roster_member(
         self,
         roster_key: str,
         canonical_key: str,
         raw_activity: Dict[str, Any],
         default_realm: str,
+        activity_index: Optional[Dict[str, List[Tuple[str, Any]]]] = None,
     ) -> Optional[Dict[str, Any]]:
         if canonical_key in raw_activity and isinstance(raw_activity[canonical_key], dict):
             return raw_activity[canonical_key]
@@ -1052,19 +1350,18 @@ class GuildActivityBridge:
         if roster_key in raw_activity and isinstance(raw_activity[roster_key], dict):
             return raw_activity[roster_key]
 
+        if activity_index is None:
+            activity_index = self._build_activity_index(raw_activity)
+
         short = self._short_name(canonical_key)
+        with_realm = activity_index.get(short, [])
 
         if short in raw_activity and isinstance(raw_activity[short], dict):
-            candidates = [k for k in raw_activity.keys() if str(k).startswith(short + "-")]
-            if len(candidates) == 0:
+            if len(with_realm) == 0:
                 return raw_activity[short]
             return None
 
-        candidates = []
-        for k, v in raw_activity.items():
-            ks = str(k)
-            if ks.startswith(short + "-") and isinstance(v, dict):
-                candidates.append((ks, v))
+        candidates = [(ks, v) for ks, v in with_realm if isinstance(v, dict)]
 
         if len(candidates) == 1:
             return candidates[0][1]
@@ -1075,15 +1372,41 @@ class GuildActivityBridge:
                     return int(entry.get("lastSeenTS", 0) or 0)
                 except Exception:
                     return 0
-            candidates.sort(key=lambda kv: ts_of(kv[1]), reverse=True)
-            top_ts = ts_of(candidates[0][1])
-            second_ts = ts_of(candidates[1][1])
+            # Solo interesan los dos más recientes: nlargest(2) en vez de ordenar todo (mismo desempate estable).
+            top, second = heapq.nlargest(2, candidates, key=lambda kv: ts_of(kv[1]))
+            top_ts = ts_of(top[1])
+            second_ts = ts_of(second[1])
             if top_ts and second_ts and abs(top_ts - second_ts) < 60:
                 return None
-            return candidates[0][1]
+            return top[1]
 
         return None
 
+    def _merge_chat_into_member(self, member_entry: Dict[str, Any], chat_data: Dict[str, Any]):
+        try:
+            member_entry["total"] = int(chat_data.get("total", member_entry.get("total", 0)) or 0)
+        except Exception:
+            pass
+        if isinstance(chat_data.get("daily"), dict):
+            member_entry["daily"] = chat_data.get("daily", {}) or {}
+        member_entry["lastMessage"] = str(chat_data.get("lastMessage", member_entry.get("lastMessage", "")) or "")
+
+        rn = chat_data.get("rankName")
+        if rn and rn != "—":
+            member_entry["rankName"] = rn
+            try:
+                member_entry["rankIndex"] = int(chat_data.get("rankIndex", 99) or 99)
+            except Exception:
+                member_entry["rankIndex"] = 99
+
+        try:
+            ts = int(chat_data.get("lastSeenTS", 0) or 0)
+        except Exception:
+            ts = 0
+        if ts > 0:
+            member_entry["lastSeenTS"] = ts
+            member_entry["lastSeen"] = str(chat_data.get("lastSeen", "") or "")
+
     # =========================
     # PASO 1: Unificación data (Roster + Chat + Stats)
     # =========================
@@ -1108,78 +1431,72 @@ class GuildActivityBridge:
         logger.info(f"Procesando {len(raw_roster)} miembros (Normalizando realm='{default_realm}')...")
 
         roster_members: Dict[str, Dict[str, Any]] = {}
+        activity_index = self._build_activity_index(raw_activity)
+
+        # Métodos usados en los loops calientes, resueltos una sola vez.
+        canon = self._canonicalize_player_key
+        short_name = self._short_name
+        find_chat = self._find_chat_entry_for_roster_member
+        merge_chat = self._merge_chat_into_member
 
+        # Una sola pasada: cada miembro nuevo se arma y se cruza con su chat en el momento.
         for roster_key, roster_info in raw_roster.items():
             rk = str(roster_key)
-            ck = self._canonicalize_player_key(rk, default_realm)
+            ck = canon(rk, default_realm)
 
             if not isinstance(roster_info, dict):
                 roster_info = {}
 
-            entry = roster_members.get(ck) or {
-                "rank": "Desconocido",
-                "level": 80,
-                "class": "UNKNOWN",
-                "is_online": False,
-
-                "rankIndex": 99,
-                "rankName": "—",
-                "total": 0,
-                "daily": {},
-                "lastSeen": "",
-                "lastSeenTS": 0,
-                "lastMessage": ""
-            }
-
-            entry["rank"] = roster_info.get("rank", entry.get("rank", "Desconocido")) or entry.get("rank", "Desconocido")
-            entry["level"] = int(roster_info.get("level", entry.get("level", 80)) or 0) or entry.get("level", 80)
-            entry["class"] = roster_info.get("class", entry.get("class", "UNKNOWN")) or entry.get("class", "UNKNOWN")
-            entry["is_online"] = bool(roster_info.get("is_online", entry.get("is_online", False)))
-
-            roster_members[ck] = entry
-
-        for canonical_name, member_entry in roster_members.items():
-            roster_key_guess = self._short_name(canonical_name)
-            chat_data = self._find_chat_entry_for_roster_member(
-                roster_key=roster_key_guess,
-                canonical_key=canonical_name,
-                raw_activity=raw_activity,
-                default_realm=default_realm,
-            )
-
-            if chat_data:
-                try:
-                    member_entry["total"] = int(chat_data.get("total", member_entry.get("total", 0)) or 0)
-                except Exception:
-                    pass
-                if isinstance(chat_data.get("daily"), dict):
-                    member_entry["daily"] = chat_data.get("daily", {}) or {}
-                member_entry["lastMessage"] = str(chat_data.get("lastMessage", member_entry.get("lastMessage", "")) or "")
-
-                rn = chat_data.get("rankName")
-                if rn and rn != "—":
-                    member_entry["rankName"] = rn
-                    try:
-                        member_entry["rankIndex"] = int(chat_data.get("rankIndex", 99) or 99)
-                    except Exception:
-                        member_entry["rankIndex"] = 99
+            entry = roster_members.get(ck)
+            if entry is None:
+                # Caso común: una sola llave por miembro -> se arma la entrada final directamente.
+                entry = {
+                    "rank": roster_info.get("rank") or "Desconocido",
+                    "level": int(roster_info.get("level", 80) or 0) or 80,
+                    "class": roster_info.get("class") or "UNKNOWN",
+                    "is_online": bool(roster_info.get("is_online", False)),
+
+                    "rankIndex": 99,
+                    "rankName": "—",
+                    "total": 0,
+                    "daily": {},
+                    "lastSeen": "",
+                    "lastSeenTS": 0,
+                    "lastMessage": ""
+                }
+                roster_members[ck] = entry
+
+                chat_data = find_chat(
+                    roster_key=short_name(ck),
+                    canonical_key=ck,
+                    raw_activity=raw_activity,
+                    default_realm=default_realm,
+                    activity_index=activity_index,
+                )
+                if chat_data:
+                    merge_chat(entry, chat_data)
+                continue
 
-                try:
-                    ts = int(chat_data.get("lastSeenTS", 0) or 0)
-                except Exception:
-                    ts = 0
-                if ts > 0:
-                    member_entry["lastSeenTS"] = ts
-                    member_entry["lastSeen"] = str(chat_data.get("lastSeen", "") or "")
+            # "Nombre" y "Nombre-Reino" en el roster: se fusiona sobre la entrada existente
+            # (solo campos de roster; el chat ya se cruzó al crearla).
+            entry["rank"] = roster_info.get("rank") or entry["rank"]
+            entry["level"] = int(roster_info.get("level") or 0) or entry["level"]
+            entry["class"] = roster_info.get("class") or entry["class"]
+            entry["is_online"] = bool(roster_info.get("is_online", entry["is_online"]))
 
         chat_only_members: Dict[str, Dict[str, Any]] = {}
+        roster_keys = roster_members.keys()
         for raw_name, chat_data in raw_activity.items():
-            if not isinstance(chat_data, dict):
+            # Las llaves del roster ya son canónicas: un acierto exacto se descarta
+            # sin str() ni canonicalizar (caso común: el chat ya trae "Nombre-Reino").
+            if raw_name in roster_keys or not isinstance(chat_data, dict):
                 continue
-            rn = str(raw_name)
-            ck = self._canonicalize_player_key(rn, default_realm)
+            # _canonicalize_player_key en línea: la mayoría ya trae "-Reino" y no necesita sufijo.
+            ck = str(raw_name).strip()
+            if ck and "-" not in ck and default_realm:
+                ck = f"{ck}-{default_realm}"
 
-            if ck in roster_members:
+            if ck in roster_keys:
                 continue
 
             entry = {
@@ -1199,10 +1516,8 @@ class GuildActivityBridge:
 
         stats_list = self._normalize_stats(raw_stats, default_realm)
 
-        union_members = dict(roster_members)
-        for ck, v in chat_only_members.items():
-            if ck not in union_members:
-                union_members[ck] = v
+        # chat_only_members excluye por construcción las llaves del roster: merge directo.
+        union_members = {**roster_members, **chat_only_members}
 
         processed = {
             "members": union_members,
@@ -1214,112 +1529,119 @@ class GuildActivityBridge:
         return processed, len(roster_members)
 
     def _normalize_stats(self, raw_stats: Any, default_realm: str) -> List[Dict[str, Any]]:
-        out: List[Dict[str, Any]] = []
-
-        if isinstance(raw_stats, dict):
+        # Despacho único por tipo exacto (SLPP solo produce dict/list planos).
+        t = type(raw_stats)
+        if t is list:
+            return self._normalize_stats_list(raw_stats, default_realm)
+        if t is dict:
             values = list(raw_stats.values())
-            if values and all(isinstance(v, dict) for v in values):
-                items = list(raw_stats.items())
+            if values and all(type(v) is dict for v in values):
+                return self._normalize_stats_intdict(raw_stats, values, default_realm)
+            return self._normalize_stats_legacy(raw_stats)
+        return []
+
+    def _normalize_stats_intdict(
+        self, raw_stats: Dict[Any, Any], values: List[Dict[str, Any]], default_realm: str
+    ) -> List[Dict[str, Any]]:
+        """Tabla Lua {[i] = snapshot} (o con llaves arbitrarias): se ordena y se trata como lista."""
+        # Llaves ya enteras (caso SLPP): sin re-parsear; si no, se convierten una sola vez.
+        if all(type(k) is int for k in raw_stats):
+            keyed = list(raw_stats.items())
+        else:
+            keyed = [(_int_or_none(k), v) for k, v in raw_stats.items()]
 
-                def key_as_int(k: Any) -> Optional[int]:
-                    try:
-                        return int(k)
-                    except Exception:
-                        return None
+        if all(k is not None for k, _ in keyed):
+            keyed.sort(key=itemgetter(0))
+            snaps = [v for _, v in keyed]
+        else:
+            snaps = sorted(values, key=_snapshot_ts)
 
-                if all(key_as_int(k) is not None for k, _ in items):
-                    items.sort(key=lambda kv: key_as_int(kv[0]) or 0)
-                    snaps = [kv[1] for kv in items]
-                else:
-                    def ts_of(s: Dict[str, Any]) -> int:
-                        try:
-                            return int(s.get("ts", 0) or 0)
-                        except Exception:
-                            return 0
-                    snaps = sorted(values, key=ts_of)
+        return self._normalize_stats_list(snaps, default_realm)
 
-                return self._normalize_stats(snaps, default_realm)
+    def _normalize_stats_legacy(self, raw_stats: Dict[Any, Any]) -> List[Dict[str, Any]]:
+        """Formato viejo {ts = onlineCount | {onlineCount/online}}."""
+        out: List[Dict[str, Any]] = []
+        out_append = out.append
+        utc_iso = _utc_iso
 
-            pairs: List[Tuple[int, Any]] = []
-            for k, v in raw_stats.items():
-                try:
-                    ts = int(k)
-                except Exception:
-                    continue
-                pairs.append((ts, v))
-            pairs.sort(key=lambda x: x[0])
-
-            for ts, v in pairs:
-                iso = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-                count_val = 0
-                if isinstance(v, dict):
-                    oc = v.get("onlineCount")
-                    if oc is None:
-                        online = v.get("online", {}) or {}
-                        count_val = len(online) if isinstance(online, dict) else 0
-                    else:
-                        try:
-                            count_val = int(oc or 0)
-                        except Exception:
-                            count_val = 0
+        pairs: List[Tuple[int, Any]] = []
+        pairs_append = pairs.append
+        for k, v in raw_stats.items():
+            try:
+                ts = int(k)
+            except Exception:
+                continue
+            pairs_append((ts, v))
+        pairs.sort(key=itemgetter(0))
+
+        for ts, v in pairs:
+            iso = utc_iso(ts)
+            count_val = 0
+            if type(v) is dict:
+                oc = v.get("onlineCount")
+                if oc is None:
+                    online = v.get("online", {}) or {}
+                    count_val = len(online) if type(online) is dict else 0
                 else:
                     try:
-                        count_val = int(v or 0)
+                        count_val = int(oc or 0)
                     except Exception:
                         count_val = 0
-
-                out.append({"iso": iso, "ts": ts, "onlineCount": int(count_val), "online": {}})
-            return out
-
-        if isinstance(raw_stats, list):
-            snaps = [s for s in raw_stats if isinstance(s, dict)]
-
-            def ts_of(s: Dict[str, Any]) -> int:
+            else:
                 try:
-                    return int(s.get("ts", 0) or 0)
+                    count_val = int(v or 0)
                 except Exception:
-                    return 0
+                    count_val = 0
 
-            snaps.sort(key=ts_of)
-            if not snaps:
-                return []
+            out_append({"iso": iso, "ts": ts, "onlineCount": int(count_val), "online": {}})
+        return out
 
-            last_ts = ts_of(snaps[-1])
+    def _normalize_stats_list(self, raw_stats: List[Any], default_realm: str) -> List[Dict[str, Any]]:
+        """Lista de snapshots; solo el último conserva el detalle `online`."""
+        out: List[Dict[str, Any]] = []
+        out_append = out.append
+        utc_iso = _utc_iso
+        canon = self._canonicalize_player_key
 
-            for snap in snaps:
-                ts = ts_of(snap)
-                iso = snap.get("iso")
-                if not iso and ts:
-                    iso = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        # (ts, snapshot) calculado una vez: el sort usa itemgetter (C) y el loop reutiliza el ts.
+        snaps = [(_snapshot_ts(s), s) for s in raw_stats if type(s) is dict]
+        snaps.sort(key=itemgetter(0))
+        if not snaps:
+            return []
 
-                online_count = snap.get("onlineCount")
-                if online_count is None:
-                    try:
-                        online_count = len(snap.get("online", {}) or {})
-                    except Exception:
-                        online_count = 0
-
-                online_payload: Dict[str, Any] = {}
-                if ts == last_ts:
-                    online = snap.get("online", {}) or {}
-                    if isinstance(online, dict):
-                        for name, info in online.items():
-                            if not isinstance(info, dict):
-                                continue
-                            online_payload[self._canonicalize_player_key(str(name), default_realm)] = {
-                                "class": info.get("class", "UNKNOWN"),
-                                "level": int(info.get("level", 80) or 80),
-                                "rank": info.get("rank", "Member"),
-                            }
-
-                out.append({
-                    "iso": str(iso or ""),
-                    "ts": ts,
-                    "onlineCount": int(online_count or 0),
-                    "online": online_payload
-                })
+        last_ts = snaps[-1][0]
+
+        for ts, snap in snaps:
+            iso = snap.get("iso")
+            if not iso and ts:
+                iso = utc_iso(ts)
 
-            return out
+            online_count = snap.get("onlineCount")
+            if online_count is None:
+                try:
+                    online_count = len(snap.get("online", {}) or {})
+                except Exception:
+                    online_count = 0
+
+            online_payload: Dict[str, Any] = {}
+            if ts == last_ts:
+                online = snap.get("online", {}) or {}
+                if type(online) is dict:
+                    for name, info in online.items():
+                        if type(info) is not dict:
+                            continue
+                        online_payload[canon(str(name), default_realm)] = {
+                            "class": info.get("class", "UNKNOWN"),
+                            "level": int(info.get("level", 80) or 80),
+                            "rank": info.get("rank", "Member"),
+                        }
+
+            out_append({
+                "iso": str(iso or ""),
+                "ts": ts,
+                "onlineCount": int(online_count or 0),
+                "online": online_payload
+            })
 
         return out
 
@@ -1331,37 +1653,50 @@ class GuildActivityBridge:
             if not stats_list:
                 return
 
-            new_snaps = [s for s in stats_list if isinstance(s, dict) and int(s.get("ts", 0) or 0) > self.state.last_uploaded_stats_ts]
-            if not new_snaps:
+            # ts entero calculado una vez por snapshot: sirve para el filtro y para ordenar.
+            last_uploaded_ts = self.state.last_uploaded_stats_ts
+            pending: List[Tuple[int, Dict[str, Any]]] = []
+            pending_append = pending.append
+            for s in stats_list:
+                if not isinstance(s, dict):
+                    continue
+                ts = int(s.get("ts", 0) or 0)
+                if ts > last_uploaded_ts:
+                    pending_append((ts, s))
+            if not pending:
                 return
 
-            new_snaps.sort(key=lambda s: int(s.get("ts", 0) or 0))
+            pending.sort(key=itemgetter(0))
+            new_snaps = [s for _, s in pending]
+            n = len(new_snaps)
 
-            logger.info(f"{Fore.YELLOW}Subiendo {len(new_snaps)} snapshots nuevos a Web (incremental stats)...")
-            self._set_ui_activity("Subiendo snapshots", progress=f"{len(new_snaps)} pendientes")
+            logger.info(f"{Fore.YELLOW}Subiendo {n} snapshots nuevos a Web (incremental stats)...")
+            self._set_ui_activity("Subiendo snapshots", progress=f"{n} pendientes")
 
             batch_size = max(10, self.config.stats_batch_size)
-            total_batches = int(math.ceil(len(new_snaps) / batch_size))
+            total_batches = (n + batch_size - 1) // batch_size
 
-            logger.info(f"[web] Stats incremental: nuevos={len(new_snaps)} | batch_size={batch_size} | batches={total_batches}")
+            logger.info(f"[web] Stats incremental: nuevos={n} | batch_size={batch_size} | batches={total_batches}")
 
-            for i in range(0, len(new_snaps), batch_size):
+            for batch_no, i in enumerate(range(0, n, batch_size), 1):
                 chunk = new_snaps[i:i + batch_size]
-                batch_no = (i // batch_size) + 1
-                done = min(i + len(chunk), len(new_snaps))
-                logger.info(f"[web] Stats batch {batch_no}/{total_batches} | snapshots {done}/{len(new_snaps)}")
+                done = min(i + len(chunk), n)
+                logger.info(f"[web] Stats batch {batch_no}/{total_batches} | snapshots {done}/{n}")
+                # Solo el último del lote conserva `online`; se reemplaza por una copia
+                # (chunk es un slice nuevo) en vez de mutar los snapshots de stats_list.
                 for j in range(len(chunk) - 1):
-                    chunk[j]["online"] = {}
+                    if chunk[j].get("online"):
+                        chunk[j] = {**chunk[j], "online": _EMPTY_ONLINE}
 
                 payload = {
                     "upload_session_id": upload_session_id,
                     "is_final_batch": False,
-                    "batch_index": int(i // batch_size) + 1,
+                    "batch_index": batch_no,
                     "total_batches": total_batches,
 
                     "uploadSessionId": upload_session_id,
                     "isFinalBatch": False,
-                    "batchIndex": int(i // batch_size) + 1,
+                    "batchIndex": batch_no,
                     "totalBatches": total_batches,
 
                     "stats": chunk,
@@ -1369,13 +1704,13 @@ class GuildActivityBridge:
 
                 self._set_ui_activity(
                     "Subiendo snapshots",
-                    progress=f"Lote {int(i // batch_size) + 1}/{total_batches}",
+                    progress=f"Lote {batch_no}/{total_batches}",
                 )
                 logger.info(
-                    f"[STATS] Enviando lote {int(i // batch_size) + 1}/{total_batches} "
+                    f"[STATS] Enviando lote {batch_no}/{total_batches} "
                     f"({len(chunk)} snapshots, ts {chunk[0].get('ts')} -> {chunk[-1].get('ts')})"
                 )
-                self._post_to_web_with_retry(payload, purpose=f"stats {i//batch_size+1}/{total_batches}")
+                self._post_to_web_with_retry(payload, purpose=f"stats {batch_no}/{total_batches}")
 
             self.state.last_uploaded_stats_ts = int(new_snaps[-1].get("ts", self.state.last_uploaded_stats_ts) or self.state.last_uploaded_stats_ts)
             self._save_state()
@@ -1394,6 +1729,10 @@ class GuildActivityBridge:
 
         self._set_ui_activity("Preparando roster/chat", progress=f"{len(roster_members)} miembros detectados")
 
+        # Roster completo (antes de reducirlo al delta): fijo durante toda la sesión.
+        full_roster = roster_members
+        total_roster_members = len(full_roster)
+
         added, updated, removed = self._compute_roster_delta(roster_members)
         roster_mode = "delta"
         roster_reason = "delta"
@@ -1429,7 +1768,7 @@ class GuildActivityBridge:
                     "added": 0,
                     "updated": 0,
                     "removed": 0,
-                    "total_members": len(processed_data.get("roster_members") or processed_data.get("members") or {}),
+                    "total_members": total_roster_members,
                     "reason": roster_reason,
                 },
 
@@ -1439,18 +1778,18 @@ class GuildActivityBridge:
                     "added": 0,
                     "updated": 0,
                     "removed": 0,
-                    "totalMembers": len(processed_data.get("roster_members") or processed_data.get("members") or {}),
+                    "totalMembers": total_roster_members,
                     "reason": roster_reason,
                 },
             }
             self._post_to_web_with_retry(summary_payload, purpose="roster no-change heartbeat")
-            self.state.roster_snapshot = self._build_roster_snapshot(processed_data.get("roster_members") or processed_data.get("members") or {})
+            self.state.roster_snapshot = self._build_roster_snapshot(full_roster)
             self._save_state()
             logger.info(f"{Fore.CYAN}No hay cambios. Se envió heartbeat.")
             self._set_ui_activity("Heartbeat sin cambios", progress="Roster intacto")
             return
 
-        all_keys = list(roster_members.keys())
+        all_keys = tuple(roster_members)
         total_members = len(all_keys)
 
         batch_size = max(10, int(self.config.batch_size))
@@ -1460,12 +1799,23 @@ class GuildActivityBridge:
         logger.info(f"{Fore.YELLOW}Upload Web Roster/Chat (ID: {session_id}) - miembros: {total_members}, batch: {batch_size}")
         self._set_ui_activity("Subiendo roster/chat", progress=f"0/{total_batches} lotes")
 
-        def build_payload(batch_keys: List[str], batch_index: int, total_batches: int, is_final: bool) -> Dict[str, Any]:
+        # Valores constantes por sesión: se calculan una vez fuera de build_payload.
+        has_changes = roster_mode in ("delta", "full")
+        added_count = len(added) if has_changes else 0
+        updated_count = len(updated) if has_changes else 0
+        removed_count = len(removed) if has_changes else 0
+        final_removed = removed if has_changes else []
+        # En delta, un "updated" cuya entrada de `data` (chat, rankName, total) no cambió respecto al snapshot solo viaja en master_roster.
+        prev_snapshot = (self.state.roster_snapshot or {}) if roster_mode == "delta" else {}
+
+        def build_payload(start: int, end: int, batch_index: int, total_batches: int, is_final: bool) -> Dict[str, Any]:
             master_roster: Dict[str, Any] = {}
             chat_data: Dict[str, Any] = {}
 
-            for name in batch_keys:
-                info = roster_members.get(name, {}) if isinstance(roster_members.get(name, {}), dict) else {}
+            for name in all_keys[start:end]:
+                info = roster_members.get(name)
+                if not isinstance(info, dict):
+                    info = {}
                 master_roster[name] = {
                     "rank": info.get("rank", "Member"),
                     "lvl": int(info.get("level", 80) or 80),
@@ -1475,16 +1825,28 @@ class GuildActivityBridge:
                 total = int(info.get("total", 0) or 0)
                 ts = int(info.get("lastSeenTS", 0) or 0)
                 last_msg = str(info.get("lastMessage", "") or "")
-                rank_name = info.get("rankName") if info.get("rankName") and info.get("rankName") != "—" else info.get("rank")
+                rank_name = _roster_rank_name(info) or "Member"
 
                 if total > 0 or ts > 0 or last_msg:
+                    # Se omite solo si todo lo que viaja en `data` es igual al snapshot previo
+                    # (un ascenso/degradación cambia rankName y debe llegar al server).
+                    prev_info = prev_snapshot.get(name)
+                    if (
+                        prev_info
+                        and prev_info.get("lastSeenTS") == ts
+                        and str(prev_info.get("lastMessage") or "") == last_msg
+                        and prev_info.get("rankName") == rank_name
+                        and prev_info.get("total") == total
+                    ):
+                        continue
+
                     last_seen_iso = ""
                     if ts > 0:
-                        last_seen_iso = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                        last_seen_iso = _utc_iso(ts)
 
                     chat_data[name] = {
                         "total": total,
-                        "rankName": rank_name or "Member",
+                        "rankName": rank_name,
                         "lastMessage": last_msg,
                         "lastSeenTS": ts,
                         "lastSeen": last_seen_iso,
@@ -1499,63 +1861,71 @@ class GuildActivityBridge:
             else:
                 session_phase = "chunk"
 
-            payload = {
-                "upload_session_id": session_id,
-                "is_final_batch": bool(is_final),
-                "batch_index": int(batch_index),
-                "total_batches": int(total_batches),
-                "removed_members": removed if is_final and roster_mode in ("delta", "full") else [],
-                "session_phase": session_phase,
-                "roster_mode": roster_mode,
-                "roster_summary": {
-                    "mode": roster_mode,
-                    "added": len(added) if roster_mode in ("delta", "full") else 0,
-                    "updated": len(updated) if roster_mode in ("delta", "full") else 0,
-                    "removed": len(removed) if roster_mode in ("delta", "full") else 0,
-                    "total_members": len(processed_data.get("roster_members") or processed_data.get("members") or {}),
-                    "reason": roster_reason,
-                },
-
-                "uploadSessionId": session_id,
-                "isFinalBatch": bool(is_final),
-                "batchIndex": int(batch_index),
-                "totalBatches": int(total_batches),
-                "removedMembers": removed if is_final and roster_mode in ("delta", "full") else [],
-                "sessionPhase": session_phase,
-                "rosterMode": roster_mode,
-                "rosterSummary": {
-                    "mode": roster_mode,
-                    "added": len(added) if roster_mode in ("delta", "full") else 0,
-                    "updated": len(updated) if roster_mode in ("delta", "full") else 0,
-                    "removed": len(removed) if roster_mode in ("delta", "full") else 0,
-                    "totalMembers": len(processed_data.get("roster_members") or processed_data.get("members") or {}),
-                    "reason": roster_reason,
-                },
-
-                "master_roster": master_roster,
-                "data": chat_data,
-                "has_changes": roster_mode in ("delta", "full"),
-            }
+            # Si el server ya declaró su estilo ("snake"/"camel"), tras los primeros lotes
+            # de la sesión se emite una sola variante de las llaves; None o "dual" emiten ambas.
+            style = self.health.get("server_style")
+            dual = style not in ("snake", "camel") or batch_index <= DUAL_KEY_BATCHES
+            payload: Dict[str, Any] = {}
+            if dual or style == "snake":
+                payload.update({
+                    "upload_session_id": session_id,
+                    "is_final_batch": bool(is_final),
+                    "batch_index": int(batch_index),
+                    "total_batches": int(total_batches),
+                    "removed_members": final_removed if is_final else [],
+                    "session_phase": session_phase,
+                    "roster_mode": roster_mode,
+                    "roster_summary": {
+                        "mode": roster_mode,
+                        "added": added_count,
+                        "updated": updated_count,
+                        "removed": removed_count,
+                        "total_members": total_roster_members,
+                        "reason": roster_reason,
+                    },
+                })
+            if dual or style == "camel":
+                payload.update({
+                    "uploadSessionId": session_id,
+                    "isFinalBatch": bool(is_final),
+                    "batchIndex": int(batch_index),
+                    "totalBatches": int(total_batches),
+                    "removedMembers": final_removed if is_final else [],
+                    "sessionPhase": session_phase,
+                    "rosterMode": roster_mode,
+                    "rosterSummary": {
+                        "mode": roster_mode,
+                        "added": added_count,
+                        "updated": updated_count,
+                        "removed": removed_count,
+                        "totalMembers": total_roster_members,
+                        "reason": roster_reason,
+                    },
+                })
+            payload["master_roster"] = master_roster
+            payload["data"] = chat_data
+            payload["has_changes"] = has_changes
             return payload
 
         idx = 0
         batch_index = 1
 
         while idx < total_members:
-            batch_keys = all_keys[idx: idx + batch_size]
-            is_final = (idx + batch_size) >= total_members
-            payload = build_payload(batch_keys, batch_index, total_batches, is_final)
+            end = min(idx + batch_size, total_members)
+            batch_len = end - idx
+            is_final = end >= total_members
+            payload = build_payload(idx, end, batch_index, total_batches, is_final)
 
             try:
                 self._set_ui_activity(
                     "Subiendo roster/chat",
-                    progress=f"Lote {batch_index}/{total_batches} ({len(batch_keys)} miembros)",
+                    progress=f"Lote {batch_index}/{total_batches} ({batch_len} miembros)",
                 )
                 logger.info(
-                    f"[ROSTER] Lote {batch_index}/{total_batches} | miembros_en_lote={len(batch_keys)} "
+                    f"[ROSTER] Lote {batch_index}/{total_batches} | miembros_en_lote={batch_len} "
                     f"| total_miembros={total_members} | modo={roster_mode} | razon={roster_reason}"
                 )
-                self._post_to_web_with_retry(payload, purpose=f"roster batch {batch_index}/{total_batches} ({len(batch_keys)})")
+                self._post_to_web_with_retry(payload, purpose=f"roster batch {batch_index}/{total_batches} ({batch_len})")
                 idx += batch_size
                 batch_index += 1
                 time.sleep(0.35)
@@ -1569,7 +1939,7 @@ class GuildActivityBridge:
                 total_batches = max(1, int(math.ceil(total_members / batch_size)))
                 time.sleep(1.0)
 
-        self.state.roster_snapshot = self._build_roster_snapshot(processed_data.get("roster_members") or processed_data.get("members") or {})
+        self.state.roster_snapshot = self._build_roster_snapshot(full_roster)
         self._save_state()
         logger.info(f"{Fore.GREEN}✔✔ Upload Web Roster/Chat completado (session {session_id}).")
         self._set_ui_activity("Subida web completada", progress=f"Sesión {session_id}", level="success")
@@ -1581,37 +1951,44 @@ class GuildActivityBridge:
         url = self.config.web_api_url
         headers = {"X-API-Key": self.config.web_api_key, "Content-Type": "application/json"}
 
-        backoff = 1.0
+        base_backoff = 1.0
+        backoff = base_backoff
         max_backoff = 20.0
         attempt = 0
         max_attempts_before_queue = 5
 
+        # Se serializa una sola vez: el mismo buffer sirve para todos los reintentos y para medir tamaño.
+        body = _json_dumps_bytes(payload)
+        payload_size = len(body)
+
         while True:
             attempt += 1
             try:
                 start = time.time()
-                resp = self._session.post(url, json=payload, headers=headers, timeout=self.config.http_timeout)
+                resp = self._session.post(url, data=body, headers=headers, timeout=self.config.http_timeout)
                 elapsed_ms = int((time.time() - start) * 1000)
                 self.health["last_latency_ms"] = elapsed_ms
-                self.health["last_payload_size"] = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+                self.health["last_payload_size"] = payload_size
                 logger.debug(
-                    f"[HTTP] POST attempt {attempt} -> {url} | ms={elapsed_ms} | size={self.health['last_payload_size']} "
+                    f"[HTTP] POST attempt {attempt} -> {url} | ms={elapsed_ms} | size={payload_size} "
                     f"| purpose={purpose}"
                 )
 
                 if resp.status_code == 200:
                     self.health["last_upload_ok"] = datetime.now().isoformat()
+                    if self.health.get("server_style") is None:
+                        self._note_server_style(resp)
                     logger.info(f"[web] OK {purpose} (HTTP 200, {elapsed_ms} ms)")
                     return
 
                 if resp.status_code == 413:
                     raise _TooLarge413()
 
-                if resp.status_code in (401, 403):
+                if resp.status_code in HTTP_AUTH_FAIL:
                     logger.error(f"{Fore.RED}Web auth error ({resp.status_code}) en {purpose}. Revisa WEB_API_KEY.")
                     raise RuntimeError(f"Web auth error {resp.status_code}")
 
-                if resp.status_code in (400, 422):
+                if resp.status_code in HTTP_VALIDATION_FAIL:
                     try:
                         details = resp.json()
                     except Exception:
@@ -1629,7 +2006,8 @@ class GuildActivityBridge:
                     return
 
                 time.sleep(backoff)
-                backoff = min(max_backoff, backoff * 1.6)
+                # Jitter decorrelado: varios bridges tras una caída no reintentan sincronizados.
+                backoff = min(max_backoff, random.uniform(base_backoff, backoff * 3.0))
                 continue
 
             except _TooLarge413:
@@ -1641,10 +2019,27 @@ class GuildActivityBridge:
                     logger.warning(f"{Fore.MAGENTA}Sin conexión estable. Payload guardado en cola local ({purpose}).")
                     return
                 time.sleep(backoff)
-                backoff = min(max_backoff, backoff * 1.6)
+                backoff = min(max_backoff, random.uniform(base_backoff, backoff * 3.0))
                 continue
 
 
+    def _note_server_style(self, resp: requests.Response):
+        """
+        Sondea una sola vez el estilo de llaves que el server declara ({"style": "snake"|"camel"}).
+        Si la primera respuesta 200 no trae uno válido se cachea "dual" y no se vuelve a sondear.
+        """
+        style = "dual"
+        try:
+            data = resp.json()
+            declared = data.get("style") if isinstance(data, dict) else None
+            if declared in ("snake", "camel"):
+                style = declared
+                logger.info(f"[web] Server declara llaves estilo '{style}'.")
+        except Exception:
+            pass
+        self.health["server_style"] = style
+
+
 class _TooLarge413(Exception):
     pass
 
@@ -1,15 +1,32 @@
 from __future__ import annotations
 
+import atexit
 import ctypes
+import functools
+import importlib.util
+import io
 import os
 import shutil
-import subprocess
-import tempfile
-import textwrap
+import sys
+import threading
+import urllib.error
 import urllib.request
-import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List
+from typing import TYPE_CHECKING, Callable, Dict, Optional, List, Tuple
+
+# zipfile/subprocess/tempfile/textwrap se importan dentro de las funciones que los usan
+# (arranque más liviano del .exe congelado).
+if TYPE_CHECKING:
+    import zipfile
+
+requests_spec = importlib.util.find_spec("requests")
+if requests_spec:
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+    from urllib3.util.retry import Retry  # type: ignore
+else:
+    requests = None  # type: ignore
 
 
 # ============================================================
@@ -35,10 +52,14 @@ PYTHON_EMBED_URL = (
     f"https://www.python.org/ftp/python/{PYTHON_EMBED_VERSION}/"
     f"python-{PYTHON_EMBED_VERSION}-embed-amd64.zip"
 )
+GET_PIP_URL = "https://bootstrap.pypa.io/get-pip.py"
 
 # Install paths
 INSTALL_ROOT = Path(os.environ.get("LOCALAPPDATA", str(Path.home()))) / "GuildActivityBridge"
 LOG_FILE = INSTALL_ROOT / "installer_log.txt"
+DOWNLOAD_CACHE_DIR = INSTALL_ROOT / "cache"
+# "--no-cache": ignora la caché de descargas (siempre baja todo de nuevo).
+USE_DOWNLOAD_CACHE = "--no-cache" not in sys.argv[1:]
 
 STARTUP_DIR = (
     Path(os.environ.get("APPDATA", ""))
@@ -51,6 +72,14 @@ STARTUP_DIR = (
 
 STARTUP_VBS_NAME = "GuildActivityBridge.vbs"
 
+# Raíces de WoW (se leen una vez al importar).
+PROGRAM_FILES = os.environ.get("PROGRAMFILES(X86)") or os.environ.get("PROGRAMFILES")
+USER_PROFILE = os.environ.get("USERPROFILE")
+
+HTTP_USER_AGENT = "GAT-Installer/1.0"
+HTTP_RETRY_TOTAL = 5
+HTTP_RETRY_STATUS = (429, 500, 502, 503, 504)
+
 
 # ============================================================
 # UI helpers
@@ -63,15 +92,38 @@ def msgbox(title: str, text: str) -> None:
         pass
 
 
+# Las descargas en paralelo también loguean: una línea a la vez en consola y archivo.
+_LOG_LOCK = threading.Lock()
+# Un solo handle (line-buffered: el log queda legible aunque el proceso muera) en vez de open/close por línea.
+_log_fh = None
+
+
+def close_log() -> None:
+    global _log_fh
+    with _LOG_LOCK:
+        if _log_fh is not None:
+            _log_fh.close()
+            _log_fh = None
+
+
+atexit.register(close_log)
+
+
 def log(msg: str) -> None:
-    INSTALL_ROOT.mkdir(parents=True, exist_ok=True)
+    global _log_fh
     line = f"[installer] {msg}"
-    print(line)
-    try:
-        with LOG_FILE.open("a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        pass
+    with _LOG_LOCK:
+        print(line)
+        if _log_fh is None:
+            INSTALL_ROOT.mkdir(parents=True, exist_ok=True)
+            try:
+                _log_fh = LOG_FILE.open("a", encoding="utf-8", buffering=1)
+            except Exception:
+                return
+        try:
+            _log_fh.write(line + "\n")
+        except Exception:
+            pass
 
 
 def step(n: int, title: str) -> None:
@@ -79,8 +131,14 @@ def step(n: int, title: str) -> None:
 
 
 def pause_console() -> None:
+    # Igual que "pause" (cualquier tecla) pero leyendo la consola directo, sin lanzar cmd.exe.
     try:
-        os.system("pause")
+        import msvcrt
+    except ImportError:
+        return
+    print("Presiona una tecla para continuar . . .", flush=True)
+    try:
+        msvcrt.getwch()
     except Exception:
         pass
 
@@ -89,44 +147,290 @@ def pause_console() -> None:
 # Download + Zip helpers
 # ============================================================
 
+def _build_session():
+    """
+    Session única con pool keep-alive: las descargas al mismo host reusan la conexión TLS.
+    urllib3 reintenta 429/5xx con backoff y respeta Retry-After.
+    """
+    if requests is None:
+        return None
+    session = requests.Session()
+    session.headers["User-Agent"] = HTTP_USER_AGENT
+    retry = Retry(
+        total=HTTP_RETRY_TOTAL,
+        backoff_factor=1.0,
+        status_forcelist=HTTP_RETRY_STATUS,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = _build_session()
+
+
+def _urlopen(url: str, headers: Optional[dict] = None):
+    """Fallback sin requests: pide gzip (get-pip.py baja ~3x menos) y devuelve (respuesta, cuerpo decodificado)."""
+    req = urllib.request.Request(
+        url, headers={"User-Agent": HTTP_USER_AGENT, "Accept-Encoding": "gzip", **(headers or {})}
+    )
+    r = urllib.request.urlopen(req, timeout=240)
+    if r.headers.get("Content-Encoding", "").lower() == "gzip":
+        import gzip
+
+        return r, gzip.GzipFile(fileobj=r)
+    return r, r
+
+
+def _stream_to_file(body, headers, fh) -> None:
+    """
+    copyfileobj con el archivo ya dimensionado a Content-Length: el sistema de archivos reserva
+    el espacio de una vez en lugar de extenderlo bloque a bloque. Con Content-Encoding el largo
+    no corresponde a lo descomprimido, así que no se reserva.
+    """
+    size = 0 if headers.get("Content-Encoding") else int(headers.get("Content-Length") or 0)
+    if size > 0:
+        fh.truncate(size)
+    shutil.copyfileobj(body, fh, 1 << 20)
+    fh.truncate()  # ajusta al largo real escrito
+
+
 def download_file(url: str, dest: Path) -> Path:
     log(f"Descargando: {url}")
     dest.parent.mkdir(parents=True, exist_ok=True)
-    req = urllib.request.Request(url, headers={"User-Agent": "GAT-Installer/1.0"})
-    with urllib.request.urlopen(req, timeout=240) as r:
-        data = r.read()
-    dest.write_bytes(data)
+    # Se escribe en streaming con bloques de 1 MB (copyfileobj itera en C) a un .part;
+    # solo se renombra al terminar, así un corte no deja un archivo truncado que parezca válido.
+    part = dest.with_name(dest.name + ".part")
+    try:
+        if _SESSION is not None:
+            with _SESSION.get(url, stream=True, timeout=240) as r:
+                r.raise_for_status()
+                r.raw.decode_content = True
+                with part.open("wb") as fh:
+                    _stream_to_file(r.raw, r.headers, fh)
+        else:
+            r, body = _urlopen(url)
+            with r, part.open("wb") as fh:
+                _stream_to_file(body, r.headers, fh)
+        os.replace(part, dest)
+    finally:
+        if part.exists():
+            part.unlink()
     log(f"Descarga OK: {dest} ({dest.stat().st_size} bytes)")
     return dest
 
 
-def extract_zip(zip_path: Path, dest: Path) -> None:
-    log(f"Extrayendo {zip_path.name} -> {dest}")
-    dest.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(dest)
+def download_to_memory(url: str, cache_name: Optional[str] = None) -> io.BytesIO:
+    """
+    Descarga a un buffer en memoria: los zips se abren directo, sin escribir+releer un temporal.
+    Con cache_name se guarda una copia + su ETag en DOWNLOAD_CACHE_DIR y las reinstalaciones
+    hacen GET condicional (If-None-Match): un 304 reutiliza la copia local sin bajar el zip.
+    """
+    log(f"Descargando (memoria): {url}")
+    headers = {}
+    cached = etag_file = None
+    if cache_name and USE_DOWNLOAD_CACHE:
+        cached = DOWNLOAD_CACHE_DIR / cache_name
+        etag_file = cached.with_name(cached.name + ".etag")
+        try:
+            if cached.is_file():
+                headers["If-None-Match"] = etag_file.read_text(encoding="utf-8").strip()
+        except OSError:
+            pass
+
+    buf = io.BytesIO()
+    etag = ""
+    not_modified = False
+    if _SESSION is not None:
+        with _SESSION.get(url, stream=True, timeout=240, headers=headers) as r:
+            if r.status_code == 304:
+                not_modified = True
+            else:
+                r.raise_for_status()
+                etag = r.headers.get("ETag", "")
+                r.raw.decode_content = True
+                shutil.copyfileobj(r.raw, buf, 1 << 20)
+    else:
+        try:
+            r, body = _urlopen(url, headers)
+            with r:
+                etag = r.headers.get("ETag", "")
+                shutil.copyfileobj(body, buf, 1 << 20)
+        except urllib.error.HTTPError as exc:
+            if exc.code != 304:
+                raise
+            not_modified = True
+
+    if not_modified and cached is not None:
+        log(f"Sin cambios (304), uso caché: {cached}")
+        return io.BytesIO(cached.read_bytes())
+
+    if cached is not None:
+        try:
+            # El .etag siempre describe el último zip bajado (is_up_to_date se fía de él).
+            try:
+                etag_file.unlink()
+            except FileNotFoundError:
+                pass
+            if etag:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                cached.write_bytes(buf.getbuffer())
+                etag_file.write_text(etag, encoding="utf-8")
+        except OSError as exc:
+            log(f"No pude guardar caché de descarga ({exc}).")
+
+    buf.seek(0)
+    log(f"Descarga OK: {url} ({buf.getbuffer().nbytes} bytes)")
+    return buf
+
+
+def _installed_stamp(cache_name: str, target: Path) -> Optional[str]:
+    """Contenido del sello "instalado desde": ETag de la última descarga de cache_name + destino."""
+    try:
+        etag = (DOWNLOAD_CACHE_DIR / f"{cache_name}.etag").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return f"{etag}\n{target}\n" if etag else None
+
+
+def is_up_to_date(cache_name: str, target: Path) -> bool:
+    """True si target ya se instaló desde la misma versión (ETag) del zip recién descargado/validado."""
+    if not USE_DOWNLOAD_CACHE or not target.exists():
+        return False
+    stamp = _installed_stamp(cache_name, target)
+    try:
+        return stamp is not None and (DOWNLOAD_CACHE_DIR / f"{cache_name}.installed").read_text(encoding="utf-8") == stamp
+    except OSError:
+        return False
+
+
+def mark_installed(cache_name: str, target: Path) -> None:
+    stamp_file = DOWNLOAD_CACHE_DIR / f"{cache_name}.installed"
+    stamp = _installed_stamp(cache_name, target) if USE_DOWNLOAD_CACHE else None
+    try:
+        if stamp is None:
+            stamp_file.unlink()
+        else:
+            stamp_file.write_text(stamp, encoding="utf-8")
+    except OSError:
+        pass
+
 
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0) | getattr(os, "O_SEQUENTIAL", 0)
 
-def download_and_extract_repo(zip_url: str, tmp_dir: Path) -> Path:
-    tmp_zip = tmp_dir / "repo.zip"
-    download_file(zip_url, tmp_zip)
-    extract_zip(tmp_zip, tmp_dir)
+# Con pocos miembros el pool no compensa; el embed y los repos traen cientos de archivos chicos.
+ZIP_PARALLEL_MIN_MEMBERS = 32
+ZIP_EXTRACT_WORKERS = min(8, os.cpu_count() or 4)
+
+
+def _write_zip_member(zf: zipfile.ZipFile, zi: zipfile.ZipInfo, out: Path) -> None:
+    """Vuelca un miembro del zip con bloques de 1 MB; en Windows O_SEQUENTIAL avisa al caché que es escritura única."""
+    fd = os.open(out, _WRITE_FLAGS, 0o666)
+    with os.fdopen(fd, "wb") as fh, zf.open(zi) as src:
+        shutil.copyfileobj(src, fh, 1 << 20)
+
+
+def _zip_opener(zip_src):
+    """Fábrica de handles independientes: ZipFile no es thread-safe, pero un handle por worker sí."""
+    import zipfile
+
+    if isinstance(zip_src, (str, Path)):
+        return lambda: zipfile.ZipFile(zip_src, "r")
+    # getvalue() materializa el zip como bytes una vez por opener (a lo sumo una copia del buffer;
+    # CPython suele devolver el buffer interno sin copiar). Los BytesIO de cada worker comparten
+    # esos bytes inmutables sin volver a copiarlos.
+    data = zip_src.getvalue()
+    return lambda: zipfile.ZipFile(io.BytesIO(data), "r")
+
+
+def _extract_members(open_zip, jobs: List[Tuple[zipfile.ZipInfo, Path]]) -> None:
+    """
+    Escribe (ZipInfo, destino). Las carpetas se crean antes (sin carreras de mkdir entre hilos);
+    con muchos miembros se reparten round-robin por tamaño comprimido entre workers con su propio handle
+    (zlib y la escritura a disco sueltan el GIL).
+    """
+    for d in {out.parent for _, out in jobs}:
+        os.makedirs(d, exist_ok=True)
+
+    if len(jobs) < ZIP_PARALLEL_MIN_MEMBERS:
+        with open_zip() as zf:
+            for zi, out in jobs:
+                _write_zip_member(zf, zi, out)
+        return
+
+    buckets: List[List[Tuple[zipfile.ZipInfo, Path]]] = [[] for _ in range(ZIP_EXTRACT_WORKERS)]
+    for i, job in enumerate(sorted(jobs, key=lambda j: j[0].compress_size, reverse=True)):
+        buckets[i % ZIP_EXTRACT_WORKERS].append(job)
+
+    def _work(bucket: List[Tuple[zipfile.ZipInfo, Path]]) -> None:
+        with open_zip() as zf:
+            for zi, out in bucket:
+                _write_zip_member(zf, zi, out)
+
+    with ThreadPoolExecutor(max_workers=ZIP_EXTRACT_WORKERS) as pool:
+        for fut in [pool.submit(_work, b) for b in buckets if b]:
+            fut.result()
+
+
+def extract_zip(zip_src, dest: Path) -> None:
+    """zip_src: ruta o BytesIO (p.ej. el buffer de download_to_memory)."""
+    name = zip_src.name if isinstance(zip_src, Path) else "zip en memoria"
+    log(f"Extrayendo {name} -> {dest}")
+    dest.mkdir(parents=True, exist_ok=True)
+    open_zip = _zip_opener(zip_src)
+    jobs: List[Tuple[zipfile.ZipInfo, Path]] = []
+    with open_zip() as zf:
+        for zi in zf.infolist():
+            parts = [p for p in zi.filename.replace("\\", "/").split("/") if p not in ("", ".")]
+            # Igual que extractall: nada fuera de dest (rutas absolutas o "..").
+            if not parts or ".." in parts or ":" in parts[0]:
+                continue
+            out = dest.joinpath(*parts)
+            if zi.is_dir():
+                out.mkdir(parents=True, exist_ok=True)
+                continue
+            jobs.append((zi, out))
+    _extract_members(open_zip, jobs)
+
+
+def download_and_extract_repo(zip_url: str, tmp_dir: Path, zip_buf: Optional[io.BytesIO] = None) -> Path:
+    """zip_buf: zip ya descargado (prefetch en paralelo desde main); si falta se descarga aquí."""
+    extract_zip(zip_buf if zip_buf is not None else download_to_memory(zip_url), tmp_dir)
+
+    # .../{owner}/{repo}/archive/refs/heads/{branch}.zip -> GitHub extrae a "{repo}-{branch}".
+    parts = zip_url.split("/")
+    if len(parts) > 4 and parts[-1].endswith(".zip"):
+        expected = tmp_dir / f"{parts[4]}-{parts[-1][:-len('.zip')]}"
+        if expected.is_dir():
+            return expected
 
     roots = [p for p in tmp_dir.iterdir() if p.is_dir()]
     if not roots:
         raise RuntimeError("Zip extraído sin carpetas (estructura inesperada).")
 
-    roots.sort(key=lambda p: sum(1 for _ in p.rglob("*")), reverse=True)
+    # Los zips de GitHub traen una sola carpeta raíz: solo se cuenta si hay que desempatar.
+    if len(roots) > 1:
+        roots.sort(key=lambda p: sum(len(d) + len(f) for _, d, f in os.walk(p)), reverse=True)
     return roots[0]
 
 
-def find_file_ci(repo_root: Path, filename: str) -> Optional[Path]:
-    """Busca un archivo por nombre, case-insensitive."""
-    target = filename.lower()
-    for p in repo_root.rglob("*"):
-        if p.is_file() and p.name.lower() == target:
-            return p
-    return None
+def _index_repo(repo_root: Path) -> Tuple[Dict[str, Path], Dict[str, Path]]:
+    """
+    Un solo os.walk (scandir, sin stat por entrada): {nombre.lower(): primer archivo} y
+    {nombre.lower(): primera carpeta}, en el mismo orden de recorrido que rglob.
+    """
+    files: Dict[str, Path] = {}
+    dirs: Dict[str, Path] = {}
+    for dirpath, dirnames, filenames in os.walk(repo_root):
+        for d in dirnames:
+            dirs.setdefault(d.lower(), Path(dirpath, d))
+        for f in filenames:
+            files.setdefault(f.lower(), Path(dirpath, f))
+    return files, dirs
 
 
 # ============================================================
@@ -142,103 +446,192 @@ def ensure_portable_python(target_dir: Path) -> Path:
         log("Python portable ya existe.")
         return python_exe
 
-    with tempfile.TemporaryDirectory() as td:
-        td_path = Path(td)
-        tmp_zip = td_path / "python-embed.zip"
-        download_file(PYTHON_EMBED_URL, tmp_zip)
-        extract_zip(tmp_zip, python_dir)
+    # get-pip.py se descarga en paralelo con el embed (hosts distintos); no hace falta
+    # si el wheelhouse empaquetado ya trae el wheel de pip.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        get_pip_dl = None
+        if bundled_pip_wheel() is None:
+            get_pip_dl = pool.submit(download_file, GET_PIP_URL, target_dir / "get-pip.py")
+        extract_zip(download_to_memory(PYTHON_EMBED_URL, cache_name="python-embed.zip"), python_dir)
+        if get_pip_dl is not None:
+            get_pip_dl.result()
 
     # habilitar import site + permitir imports locales (.\" y .\DLLs)
     pth_file = next(python_dir.glob("*._pth"), None)
     if pth_file:
         pth_lines = pth_file.read_text(encoding="utf-8").splitlines()
+        # Una pasada: habilita "import site", junta las entradas (normalizadas) y ubica dónde insertar.
         out: List[str] = []
+        entries = set()
+        insert_at: Optional[int] = None
         for line in pth_lines:
             s = line.strip()
             if s.startswith("#import site") or s == "import site":
-                out.append("import site")
-            else:
-                out.append(line)
+                line = s = "import site"
+                # Inserta antes de "import site" para mantenerlo como última línea
+                if insert_at is None:
+                    insert_at = len(out)
+            out.append(line)
+            entries.add(s.lower())
+        if insert_at is None:
+            insert_at = len(out)
 
         # Asegura que el Python embebido pueda importar módulos del propio folder y DLLs (tkinter/_tkinter)
-        def _has_entry(value: str) -> bool:
-            v = value.strip().lower()
-            for l in out:
-                if l.strip().lower() == v:
-                    return True
-            return False
-
-        # Inserta antes de "import site" (si existe) para mantenerlo como última línea
-        insert_at = len(out)
-        for i, l in enumerate(out):
-            if l.strip() == "import site":
-                insert_at = i
-                break
-
-        if not _has_entry("."):
+        if "." not in entries:
             out.insert(insert_at, ".")
             insert_at += 1
-        if not (_has_entry(".\\DLLs") or _has_entry(".\\dlls") or _has_entry("DLLs") or _has_entry("dlls") or _has_entry(".\\DLLS")):
+        if ".\\dlls" not in entries and "dlls" not in entries:
             out.insert(insert_at, ".\\DLLs")
 
-        pth_file.write_text("\n".join(out) + "\n", encoding="utf-8")
-        log(f"Actualizado {pth_file.name} (import site + rutas locales habilitadas).")
-
-    # instalar pip
-    get_pip = target_dir / "get-pip.py"
-    download_file("https://bootstrap.pypa.io/get-pip.py", get_pip)
-    log("Instalando pip (Python portable)...")
-    subprocess.run([str(python_exe), str(get_pip)], check=True)
+        # Sin cambios (embed que ya trae las rutas) -> no se reescribe.
+        if out != pth_lines:
+            pth_file.write_text("\n".join(out) + "\n", encoding="utf-8")
+            log(f"Actualizado {pth_file.name} (import site + rutas locales habilitadas).")
 
+    # pip se instala en pip_install() junto con los requirements (un solo arranque del intérprete).
     return python_exe
 
 
 
+def bundled_wheels_dir() -> Optional[Path]:
+    """Wheelhouse empaquetado junto al instalador (PyInstaller lo expone en sys._MEIPASS)."""
+    base = Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent))
+    wheels = base / "wheels"
+    if wheels.is_dir() and any(wheels.glob("*.whl")):
+        return wheels
+    return None
+
+
+def bundled_pip_wheel() -> Optional[Path]:
+    wheels = bundled_wheels_dir()
+    if wheels is None:
+        return None
+    return next(iter(sorted(wheels.glob("pip-*.whl"), reverse=True)), None)
+
+
+def _has_pip(python_exe: Path) -> bool:
+    return (python_exe.parent / "Lib" / "site-packages" / "pip").is_dir()
+
+
+# Flags comunes: sin consulta de versión a PyPI, sin sdists si hay wheel, sin precompilar .pyc
+# (se generan en el primer arranque del bridge).
+PIP_FLAGS = ("--disable-pip-version-check", "--no-input", "--prefer-binary", "--no-compile")
+PIP_MIN_VERSION = (24, 0)
+
+
+def _pip_version(python_exe: Path) -> Optional[Tuple[int, ...]]:
+    """Versión de pip leída del nombre de su .dist-info (sin arrancar el intérprete)."""
+    for d in (python_exe.parent / "Lib" / "site-packages").glob("pip-*.dist-info"):
+        try:
+            return tuple(int(x) for x in d.name[len("pip-"):-len(".dist-info")].split(".")[:2])
+        except ValueError:
+            continue
+    return None
+
+
 def pip_install(python_exe: Path, requirements: Path) -> None:
+    import subprocess
+
+    # Una sola conversión a str para todos los argv
+    py = os.fspath(python_exe)
+    req = os.fspath(requirements)
+    wheels = bundled_wheels_dir()
+
+    pip_whl = bundled_pip_wheel()
+    if not _has_pip(python_exe) and pip_whl:
+        # pip se ejecuta directo desde su wheel (zipimport) y se instala a sí mismo + requirements offline.
+        log("Instalando pip + dependencias offline (wheel empaquetado)...")
+        try:
+            subprocess.check_call(
+                [
+                    py, str(pip_whl / "pip"), "install",
+                    *PIP_FLAGS,
+                    "--no-index", "--find-links", str(wheels),
+                    str(pip_whl), "-r", req,
+                ]
+            )
+            return
+        except subprocess.CalledProcessError as exc:
+            log(f"Wheelhouse incompleto ({exc}). Uso get-pip.py + PyPI.")
+
+    if not _has_pip(python_exe):
+        # get-pip.py reenvía sus argumentos a "pip install": pip + requirements en un solo proceso.
+        get_pip = python_exe.parent.parent / "get-pip.py"
+        if not get_pip.is_file():
+            download_file(GET_PIP_URL, get_pip)
+        log("Instalando pip + dependencias (Python portable)...")
+        cmd = [py, str(get_pip), *PIP_FLAGS]
+        if wheels:
+            cmd += ["--find-links", str(wheels)]
+        subprocess.check_call(cmd + ["-r", req])
+        return
+
+    if wheels:
+        log(f"Instalando dependencias offline desde {wheels}...")
+        try:
+            subprocess.check_call(
+                [
+                    py, "-m", "pip", "install",
+                    *PIP_FLAGS,
+                    "--no-index", "--find-links", str(wheels),
+                    "-r", req,
+                ]
+            )
+            return
+        except subprocess.CalledProcessError as exc:
+            log(f"Wheelhouse incompleto ({exc}). Reintentando contra PyPI.")
+
     log("Instalando dependencias con pip...")
-    subprocess.run([str(python_exe), "-m", "pip", "install", "--upgrade", "pip"], check=True)
-    subprocess.run([str(python_exe), "-m", "pip", "install", "-r", str(requirements)], check=True)
+    # Un solo arranque del intérprete + una resolución: upgrade de pip (solo si es viejo) y requirements juntos.
+    cmd = [py, "-m", "pip", "install", *PIP_FLAGS]
+    version = _pip_version(python_exe)
+    if version is None or version < PIP_MIN_VERSION:
+        cmd += ["--upgrade", "pip"]
+    subprocess.check_call(cmd + ["-r", req])
 
 
 # ============================================================
 # WoW detection
 # ============================================================
 
-def detect_wow_addons_paths() -> List[Path]:
-    candidates: List[Path] = []
-    program_files = os.environ.get("PROGRAMFILES(X86)") or os.environ.get("PROGRAMFILES")
-    user_profile = os.environ.get("USERPROFILE")
+WOW_FLAVORS = ("_retail_", "_classic_", "_classic_era_")
 
-    if program_files:
-        wow_root = Path(program_files) / "World of Warcraft"
-        candidates.extend([
-            wow_root / "_retail_" / "Interface" / "AddOns",
-            wow_root / "_classic_" / "Interface" / "AddOns",
-            wow_root / "_classic_era_" / "Interface" / "AddOns",
-        ])
 
-    if user_profile:
-        docs_root = Path(user_profile) / "Documents" / "World of Warcraft"
-        candidates.extend([
-            docs_root / "_retail_" / "Interface" / "AddOns",
-            docs_root / "_classic_" / "Interface" / "AddOns",
-            docs_root / "_classic_era_" / "Interface" / "AddOns",
-        ])
+@functools.lru_cache(maxsize=1)
+def detect_wow_addons_paths() -> Tuple[Path, ...]:
+    """
+    Rutas AddOns existentes, en orden de preferencia (Program Files antes que Documents).
+    Un scandir por raíz de WoW: solo se prueban los flavors que realmente están instalados.
+    """
+    roots: List[Path] = []
+    if PROGRAM_FILES:
+        roots.append(Path(PROGRAM_FILES) / "World of Warcraft")
+    if USER_PROFILE:
+        roots.append(Path(USER_PROFILE) / "Documents" / "World of Warcraft")
 
-    return candidates
+    candidates: List[Path] = []
+    for root in roots:
+        try:
+            with os.scandir(root) as it:
+                present = {e.name.lower() for e in it if e.is_dir()}
+        except OSError:
+            continue
+        for flavor in WOW_FLAVORS:
+            if flavor in present:
+                addons = root / flavor / "Interface" / "AddOns"
+                if addons.is_dir():
+                    candidates.append(addons)
+
+    return tuple(candidates)
 
 
 def choose_wow_addons_path() -> Path:
     for p in detect_wow_addons_paths():
-        if p.exists():
-            log(f"Detectado AddOns existente: {p}")
-            return p
+        log(f"Detectado AddOns existente: {p}")
+        return p
 
-    program_files = os.environ.get("PROGRAMFILES(X86)") or os.environ.get("PROGRAMFILES")
-    user_profile = os.environ.get("USERPROFILE")
-
-    pf_candidate = Path(program_files) / "World of Warcraft" / "_retail_" / "Interface" / "AddOns" if program_files else None
-    docs_candidate = Path(user_profile) / "Documents" / "World of Warcraft" / "_retail_" / "Interface" / "AddOns" if user_profile else None
+    pf_candidate = Path(PROGRAM_FILES) / "World of Warcraft" / "_retail_" / "Interface" / "AddOns" if PROGRAM_FILES else None
+    docs_candidate = Path(USER_PROFILE) / "Documents" / "World of Warcraft" / "_retail_" / "Interface" / "AddOns" if USER_PROFILE else None
 
     if pf_candidate:
         try:
@@ -274,77 +667,147 @@ def detect_savedvariables_from_addons_path(addons_path: Path) -> Optional[Path]:
     if not account_root.exists():
         return None
 
-    candidates = list(account_root.glob("*/SavedVariables/GuildActivityTracker.lua"))
-    if not candidates:
-        return None
+    # Una pasada con scandir + stat por cuenta; se queda con el más reciente sin ordenar.
+    best: Optional[str] = None
+    best_mtime = -1.0
+    with os.scandir(account_root) as it:
+        for acc in it:
+            if not acc.is_dir():
+                continue
+            sv = os.path.join(acc.path, "SavedVariables", "GuildActivityTracker.lua")
+            try:
+                st = os.stat(sv)
+            except OSError:
+                continue
+            if st.st_mtime > best_mtime:
+                best, best_mtime = sv, st.st_mtime
 
-    candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return candidates[0]
+    return Path(best) if best else None
 
 
 # ============================================================
 # Bridge + Addon installation
 # ============================================================
 
+def _fast_copy(src, dst):
+    """En Windows CopyFileW copia en kernel (sin buffer en userspace) y conserva fecha/atributos; si falla, copy2."""
+    if sys.platform == "win32" and ctypes.windll.kernel32.CopyFileW(str(src), str(dst), False):
+        return dst
+    shutil.copy2(src, dst)
+    return dst
+
+
+def _link_or_copy(src, dst):
+    """copy_function para copytree: hardlink (solo metadata) si comparten volumen; si no, _fast_copy."""
+    try:
+        # unlink directo (sin lexists previo): un syscall menos por archivo en copytree.
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+        os.link(src, dst)
+    except OSError:
+        _fast_copy(src, dst)
+    return dst
+
+
+def _sync_tree(src: Path, dst: Path) -> None:
+    """
+    copytree sobre lo ya instalado (hardlinks, sin rmtree previo) y luego poda lo que
+    ya no existe en src: dst queda igual que src, como con el rmtree + copytree anterior.
+    """
+    shutil.copytree(src, dst, dirs_exist_ok=True, copy_function=_link_or_copy)
+    for dirpath, dirnames, filenames in os.walk(dst, topdown=False):
+        src_dir = os.path.join(src, os.path.relpath(dirpath, dst))
+        for f in filenames:
+            if not os.path.lexists(os.path.join(src_dir, f)):
+                os.unlink(os.path.join(dirpath, f))
+        for d in dirnames:
+            if not os.path.isdir(os.path.join(src_dir, d)):
+                shutil.rmtree(os.path.join(dirpath, d), ignore_errors=True)
+
+
 def copy_bridge_from_repo(repo_root: Path, install_root: Path) -> None:
     install_root.mkdir(parents=True, exist_ok=True)
 
-    # 🔥 Case-insensitive + validación dura
+    # 🔥 Case-insensitive + validación dura (un solo recorrido del repo para todas las búsquedas)
+    files, dirs = _index_repo(repo_root)
     required = ["guild_activity_bridge.py", "requirements.txt"]
-    copied = []
+    sources = []
 
     for name in required:
-        p = find_file_ci(repo_root, name)
-        if not p or not p.is_file():
+        p = files.get(name)
+        if not p:
             raise RuntimeError(f"No encontré '{name}' dentro del repo {UPLOADER_REPO} (case-insensitive).")
-        shutil.copy2(p, install_root / name)
-        copied.append(name)
-        log(f"Copiado {name} <- {p}")
+        sources.append((name, p))
 
     # (UI eliminada) No copiamos bridge_ui.py para mantener la instalación simple.
 
 
     # opcional media/
-    media = None
-    for p in repo_root.rglob("*"):
-        if p.is_dir() and p.name.lower() == "media":
-            media = p
-            break
+    media = dirs.get("media")
+
+    # Copias independientes en paralelo: el I/O de archivos libera el GIL.
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(_link_or_copy, p, install_root / name) for name, p in sources]
+        if media:
+            futures.append(pool.submit(_sync_tree, media, install_root / "media"))
+        for fut in futures:
+            fut.result()
+
+    for name, p in sources:
+        log(f"Copiado {name} <- {p}")
     if media:
-        dst = install_root / "media"
-        if dst.exists():
-            shutil.rmtree(dst)
-        shutil.copytree(media, dst)
         log("Copiado media/ (opcional)")
 
 
-def install_addon_as_guildactivitytracker(addons_path: Path) -> None:
+def _addon_prefix_in_zip(names: List[str]) -> Optional[str]:
+    """Carpeta (dentro del zip) del .toc menos profundo, p.ej. "Repo-main/Addon/"."""
+    best: Optional[str] = None
+    for n in names:
+        if n.endswith("/") or not n.lower().endswith(".toc"):
+            continue
+        prefix = n[: n.rfind("/") + 1]
+        if best is None or prefix.count("/") < best.count("/"):
+            best = prefix
+    return best
+
+
+def install_addon_as_guildactivitytracker(addons_path: Path, zip_buf: Optional[io.BytesIO] = None) -> None:
     addons_path.mkdir(parents=True, exist_ok=True)
+    if zip_buf is None:
+        zip_buf = download_to_memory(ADDON_ZIP_URL, cache_name="addon.zip")
 
-    with tempfile.TemporaryDirectory() as td:
-        td_path = Path(td)
-        repo_root = download_and_extract_repo(ADDON_ZIP_URL, td_path)
+    target = addons_path / "GuildActivityTracker"
+    if is_up_to_date("addon.zip", target):
+        log(f"Addon ya actualizado (mismo ETag), omito extracción: {target}")
+        return
 
-        # Detectar carpeta raíz del addon por .toc (case-insensitive)
-        addon_source = None
-        for d in repo_root.rglob("*"):
-            if d.is_dir():
-                for f in d.iterdir():
-                    if f.is_file() and f.suffix.lower() == ".toc":
-                        addon_source = d
-                        break
-            if addon_source:
-                break
+    open_zip = _zip_opener(zip_buf)
+    with open_zip() as zf:
+        infos = zf.infolist()
 
-        if addon_source is None:
-            raise RuntimeError("No encontré ningún .toc en el repo del addon. Revisa estructura del repo.")
+    # Carpeta raíz del addon por .toc (case-insensitive); solo se extrae ese subárbol.
+    prefix = _addon_prefix_in_zip([zi.filename for zi in infos])
+    if prefix is None:
+        raise RuntimeError("No encontré ningún .toc en el repo del addon. Revisa estructura del repo.")
 
-        target = addons_path / "GuildActivityTracker"
-        if target.exists():
-            shutil.rmtree(target)
+    if target.exists():
+        shutil.rmtree(target)
+    target.mkdir(parents=True)
 
-        shutil.copytree(addon_source, target)
-        log(f"Addon instalado como: {target}")
+    jobs: List[Tuple[zipfile.ZipInfo, Path]] = []
+    for zi in infos:
+        if zi.is_dir() or not zi.filename.startswith(prefix):
+            continue
+        rel = zi.filename[len(prefix):]
+        if ".." in rel.split("/"):
+            continue
+        jobs.append((zi, target / rel))
+    _extract_members(open_zip, jobs)
+    mark_installed("addon.zip", target)
+
+    log(f"Addon instalado como: {target}")
 
 
 # ============================================================
@@ -352,6 +815,8 @@ def install_addon_as_guildactivitytracker(addons_path: Path) -> None:
 # ============================================================
 
 def write_env_file(install_root: Path, wow_addon_path_value: str) -> None:
+    import textwrap
+
     env_path = install_root / ".env"
     content = textwrap.dedent(
         f"""
@@ -374,6 +839,8 @@ def create_start_scripts(install_root: Path, python_exe: Path) -> None:
     - start_bridge.bat: arranca el bridge en el mismo CMD.
     - start_bridge_minimized.vbs: arranca el .bat en un CMD minimizado (taskbar).
     """
+    import textwrap
+
     runner = install_root / "start_bridge.bat"
     runner.write_text(
         textwrap.dedent(
@@ -407,13 +874,12 @@ def register_startup(install_root: Path) -> None:
     STARTUP_DIR.mkdir(parents=True, exist_ok=True)
     src = install_root / "start_bridge_minimized.vbs"
     dst = STARTUP_DIR / STARTUP_VBS_NAME
-    # Sobrescribir limpio si ya existía
-    if dst.exists():
-        try:
-            dst.unlink()
-        except Exception:
-            pass
-    shutil.copy2(src, dst)
+    # Sobrescribir limpio si ya existía (unlink directo: sin exists() previo)
+    try:
+        dst.unlink()
+    except Exception:
+        pass
+    _fast_copy(src, dst)
     log(f"Autostart registrado: {dst}")
 
 
@@ -421,18 +887,16 @@ def register_startup(install_root: Path) -> None:
 # Desktop helpers (solo .cmd para cero duplicados)
 # ============================================================
 
-def get_desktop_dir() -> Path:
-    # Known Folder Desktop (fiable)
-    class GUID(ctypes.Structure):
-        _fields_ = [("Data1", ctypes.c_ulong), ("Data2", ctypes.c_ushort), ("Data3", ctypes.c_ushort), ("Data4", ctypes.c_ubyte * 8)]
+class GUID(ctypes.Structure):
+    _fields_ = [("Data1", ctypes.c_ulong), ("Data2", ctypes.c_ushort), ("Data3", ctypes.c_ushort), ("Data4", ctypes.c_ubyte * 8)]
+
 
-    def guid_from_string(s: str) -> GUID:
-        import uuid
-        u = uuid.UUID(s)
-        data4 = (ctypes.c_ubyte * 8).from_buffer_copy(u.bytes[8:])
-        return GUID(u.time_low, u.time_mid, u.time_hi_version, data4)
+# Known Folder Desktop {B4BFCC3A-DB2C-424C-B029-7FE99A87C641}, armado una vez (sin uuid ni parseo por llamada)
+FOLDERID_Desktop = GUID(0xB4BFCC3A, 0xDB2C, 0x424C, (ctypes.c_ubyte * 8)(0xB0, 0x29, 0x7F, 0xE9, 0x9A, 0x87, 0xC6, 0x41))
 
-    FOLDERID_Desktop = guid_from_string("B4BFCC3A-DB2C-424C-B029-7FE99A87C641")
+
+def get_desktop_dir() -> Path:
+    # Known Folder Desktop (fiable)
     SHGetKnownFolderPath = ctypes.windll.shell32.SHGetKnownFolderPath
     SHGetKnownFolderPath.argtypes = [ctypes.POINTER(GUID), ctypes.c_uint32, ctypes.c_void_p, ctypes.POINTER(ctypes.c_wchar_p)]
 
@@ -441,21 +905,33 @@ def get_desktop_dir() -> Path:
     if hr == 0 and ppszPath.value:
         return Path(ppszPath.value)
 
-    up = os.environ.get("USERPROFILE")
+    up = USER_PROFILE
     return Path(up) / "Desktop" if up else Path.home() / "Desktop"
 
 
+DESKTOP_PREFIX = "gat bridge - "
+
+
+def _desktop_items(desktop: Path) -> List[os.DirEntry]:
+    """Un solo scandir del Escritorio: archivos "GAT Bridge - *" (case-insensitive, como glob en Windows)."""
+    with os.scandir(desktop) as it:
+        return [e for e in it if e.name.lower().startswith(DESKTOP_PREFIX) and e.is_file()]
+
+
 def cleanup_old_desktop_items(desktop: Path) -> None:
     # Borra cualquier GAT Bridge - * (.cmd/.lnk) de instalaciones anteriores
-    for p in desktop.glob("GAT Bridge - *.*"):
+    for e in _desktop_items(desktop):
+        if "." not in e.name[len(DESKTOP_PREFIX):]:
+            continue
         try:
-            if p.is_file():
-                p.unlink()
+            os.unlink(e.path)
         except Exception:
             pass
 
 
 def write_verify_script(install_root: Path, addons_path_str: str) -> None:
+    import textwrap
+
     verify = install_root / "verify_install.bat"
 
     root = str(install_root)
@@ -540,18 +1016,15 @@ def create_desktop_cmds_only(install_root: Path) -> None:
         ("GAT Bridge - Open Installer Log.cmd", f'@echo off\nnotepad.exe "{open_log}"\n'),
     ]
 
-    created = []
-    for name, body in cmds:
-        path = desktop / name
-        path.write_text(body, encoding="utf-8")
-        created.append(path)
+    run_parallel(*(functools.partial((desktop / name).write_text, body, encoding="utf-8") for name, body in cmds))
 
     # Limpieza: eliminar duplicados por nombre (case-insensitive) más allá de estos 4
     keep_names = set(n.lower() for n, _ in cmds)
-    for p in desktop.glob("GAT Bridge - *.cmd"):
-        if p.name.lower() not in keep_names:
+    for e in _desktop_items(desktop):
+        name = e.name.lower()
+        if name.endswith(".cmd") and name not in keep_names:
             try:
-                p.unlink()
+                os.unlink(e.path)
             except Exception:
                 pass
 
@@ -559,6 +1032,8 @@ def create_desktop_cmds_only(install_root: Path) -> None:
 
 
 def write_install_summary(install_root: Path, wow_addons_path: Path, wow_addon_path_value: str) -> None:
+    import textwrap
+
     summary = install_root / "INSTALL_SUMMARY.txt"
     summary.write_text(
         textwrap.dedent(f"""
@@ -593,7 +1068,17 @@ def write_install_summary(install_root: Path, wow_addons_path: Path, wow_addon_p
 # MAIN
 # ============================================================
 
+def run_parallel(*tasks: Callable[[], None]) -> None:
+    """Tareas de I/O independientes a la vez (cada escritura paga su escaneo de antivirus); propaga errores."""
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        for fut in [pool.submit(t) for t in tasks]:
+            fut.result()
+
+
 def main() -> None:
+    import subprocess
+    import tempfile
+
     try:
         INSTALL_ROOT.mkdir(parents=True, exist_ok=True)
         if LOG_FILE.exists():
@@ -606,21 +1091,32 @@ def main() -> None:
     log(f"Install root: {INSTALL_ROOT}")
     log("==========================================")
 
+    # Los zips del bridge y del addon se descargan en paralelo mientras se prepara Python.
+    prefetch = ThreadPoolExecutor(max_workers=2)
     try:
-        step(1, "Preparar Python portable + pip")
+        uploader_zip = prefetch.submit(download_to_memory, UPLOADER_ZIP_URL, "uploader.zip")
+        addon_zip = prefetch.submit(download_to_memory, ADDON_ZIP_URL, "addon.zip")
+
+        step(1, "Preparar Python portable")
         python_exe = ensure_portable_python(INSTALL_ROOT)
         # UI eliminada: omitimos Tkinter/Tcl/Tk para mantener el instalador simple y robusto.
 
         step(2, "Descargar repo del Bridge/Uploader")
-        with tempfile.TemporaryDirectory() as td:
-            td_path = Path(td)
-            uploader_root = download_and_extract_repo(UPLOADER_ZIP_URL, td_path)
-            log(f"Uploader repo extraído: {uploader_root}")
+        uploader_buf = uploader_zip.result()
+        bridge_py = INSTALL_ROOT / "guild_activity_bridge.py"
+        if is_up_to_date("uploader.zip", bridge_py) and (INSTALL_ROOT / "requirements.txt").is_file():
+            log("Bridge ya actualizado (mismo ETag), omito extracción y copia.")
+        else:
+            with tempfile.TemporaryDirectory() as td:
+                td_path = Path(td)
+                uploader_root = download_and_extract_repo(UPLOADER_ZIP_URL, td_path, zip_buf=uploader_buf)
+                log(f"Uploader repo extraído: {uploader_root}")
 
-            step(3, "Copiar archivos del Bridge (sin iniciar.bat)")
-            copy_bridge_from_repo(uploader_root, INSTALL_ROOT)
+                step(3, "Copiar archivos del Bridge (sin iniciar.bat)")
+                copy_bridge_from_repo(uploader_root, INSTALL_ROOT)
+            mark_installed("uploader.zip", bridge_py)
 
-        step(4, "Instalar dependencias del Bridge (pip)")
+        step(4, "Instalar pip + dependencias del Bridge")
         pip_install(python_exe, INSTALL_ROOT / "requirements.txt")
 
         step(5, "Detectar / escoger ruta AddOns de WoW")
@@ -628,7 +1124,7 @@ def main() -> None:
         log(f"WoW AddOns path elegido: {wow_addons_path}")
 
         step(6, "Instalar Addon como GuildActivityTracker")
-        install_addon_as_guildactivitytracker(wow_addons_path)
+        install_addon_as_guildactivitytracker(wow_addons_path, zip_buf=addon_zip.result())
 
         step(7, "Detectar SavedVariables y escribir .env")
         savedvars = detect_savedvariables_from_addons_path(wow_addons_path)
@@ -642,13 +1138,18 @@ def main() -> None:
         write_env_file(INSTALL_ROOT, wow_addon_path_value)
 
         step(8, "Crear scripts de arranque + verify + summary")
-        create_start_scripts(INSTALL_ROOT, python_exe)
-        write_verify_script(INSTALL_ROOT, wow_addons_path)
-        write_install_summary(INSTALL_ROOT, wow_addons_path, wow_addon_path_value)
+        run_parallel(
+            lambda: create_start_scripts(INSTALL_ROOT, python_exe),
+            lambda: write_verify_script(INSTALL_ROOT, wow_addons_path),
+            lambda: write_install_summary(INSTALL_ROOT, wow_addons_path, wow_addon_path_value),
+        )
 
         step(9, "Registrar AutoStart + crear 4 accesos (.cmd) sin duplicados")
-        register_startup(INSTALL_ROOT)
-        create_desktop_cmds_only(INSTALL_ROOT)
+        # Carpetas disjuntas (Startup / Escritorio): sin dependencia entre sí.
+        run_parallel(
+            lambda: register_startup(INSTALL_ROOT),
+            lambda: create_desktop_cmds_only(INSTALL_ROOT),
+        )
 
         step(10, "Arrancar Bridge automáticamente (minimized)")
         vbs = INSTALL_ROOT / "start_bridge_minimized.vbs"
@@ -675,6 +1176,11 @@ def main() -> None:
             f"Revisa el log:\n{LOG_FILE}",
         )
 
+    prefetch.shutdown(wait=False, cancel_futures=True)
+    if _SESSION is not None:
+        _SESSION.close()
+    close_log()
+
     print("\nListo. Puedes cerrar esta ventana.")
     print(f"Log: {LOG_FILE}")
     pause_console()